@@ -0,0 +1,238 @@
+"""
+Semantic answer cache for near-duplicate questions.
+
+Users ask the same thing in slightly different words ("how do I install
+express" / "installing express?"), and every variant used to pay a full
+gemini-2.5-flash call. `AnswerCache` keeps every generated answer in a
+small Qdrant collection, `answer_cache`, as
+
+    vector:  the query embedding
+    payload: query, answer, IDs of the chunks it was generated from,
+             index version, search scope, creation time
+
+and returns the stored answer when a new query embeds within
+`ANSWER_CACHE_THRESHOLD` cosine similarity (default 0.95) of a cached one,
+under the same index version and scope (`--source` / `--pages` filters),
+and the entry is younger than `ANSWER_CACHE_TTL` seconds (default one day).
+
+The index version is a random token indexing.py writes into the
+`learning_vectors` collection metadata whenever a run changes it
+(`bump_index_version`); a blue/green rebuild gets a fresh one with its new
+collection. Answers generated from an older index stop matching at once,
+and `invalidate` deletes them. Independently of the version, deleting
+points (stale chunks of an incremental run) deletes every cached answer
+generated from one of them (`invalidate_chunks`), so an answer never
+outlives the chunks it quotes, even in the middle of an indexing run.
+
+Key behaviors:
+- `ANSWER_CACHE=0` disables the cache.
+- `ANSWER_CACHE_THRESHOLD` sets the cosine similarity a question needs to
+  reuse an answer. Short questions that differ only in a negation or an
+  entity ("how to install npm" / "how to uninstall npm") can embed above
+  0.95; raise it (e.g. 0.98) if such near-misses show up.
+- The cache collection lives next to `learning_vectors` (server or
+  embedded local mode) and is recreated when the embedding dimension
+  changes.
+- The index version is re-read at most every few seconds, so a lookup
+  costs one extra search.
+"""
+
+import os
+import time
+import uuid
+
+from qdrant_client import QdrantClient, models
+
+from query_cache import normalize_query
+
+COLLECTION_NAME = "answer_cache"
+# Cosine similarity for a hit (ANSWER_CACHE_THRESHOLD). Lower values reuse
+# more answers but risk serving one for a question that differs only in a
+# negation or an entity; see the module docstring.
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+UNVERSIONED = "unversioned"
+
+_VERSION_REFRESH_SECONDS = 5.0
+_PAYLOAD_INDEXES = {
+    "index_version": models.PayloadSchemaType.KEYWORD,
+    "scope": models.PayloadSchemaType.KEYWORD,
+    "created_at": models.PayloadSchemaType.FLOAT,
+    "chunk_ids": models.PayloadSchemaType.KEYWORD,
+}
+
+
+def index_version(client: QdrantClient, collection_name: str) -> str:
+    """The version token of the (aliased) index collection."""
+    metadata = client.get_collection(collection_name).config.metadata or {}
+    return metadata.get("index_version", UNVERSIONED)
+
+
+def bump_index_version(client: QdrantClient, collection_name: str) -> str:
+    """Give `collection_name` a new index version (its cached answers go stale)."""
+    version = uuid.uuid4().hex
+    client.update_collection(collection_name=collection_name, metadata={"index_version": version})
+    return version
+
+
+def invalidate(client: QdrantClient, keep_version: str | None = None) -> None:
+    """Delete cached answers, except those generated under `keep_version`."""
+    if not client.collection_exists(COLLECTION_NAME):
+        return
+    if keep_version is None:
+        client.delete_collection(COLLECTION_NAME)
+        return
+    client.delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=models.FilterSelector(
+            filter=models.Filter(
+                must_not=[models.FieldCondition(key="index_version", match=models.MatchValue(value=keep_version))]
+            )
+        ),
+    )
+
+
+def invalidate_chunks(client: QdrantClient, chunk_ids: list[str], batch_size: int = 1000) -> None:
+    """Delete cached answers generated from any of `chunk_ids` (points being deleted)."""
+    if not chunk_ids or not client.collection_exists(COLLECTION_NAME):
+        return
+    for start in range(0, len(chunk_ids), batch_size):
+        client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key="chunk_ids", match=models.MatchAny(any=chunk_ids[start : start + batch_size])
+                        )
+                    ]
+                )
+            ),
+        )
+
+
+def scope_key(source: str | None, pages: tuple[int, int] | None) -> str:
+    """Cache scope of a search filter: answers only match queries searched the same way."""
+    return f"{source or '*'}|{'-'.join(map(str, pages)) if pages else '*'}"
+
+
+class AnswerCache:
+    """Qdrant-backed cache of (query embedding -> answer) under one index version."""
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        index_collection: str,
+        threshold: float = DEFAULT_THRESHOLD,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ):
+        self.client = client
+        self.index_collection = index_collection
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._version: str | None = None
+        self._version_read = 0.0
+        self._dimensions: int | None = None
+
+    def _current_version(self) -> str:
+        if self._version is None or time.monotonic() - self._version_read > _VERSION_REFRESH_SECONDS:
+            self._version = index_version(self.client, self.index_collection)
+            self._version_read = time.monotonic()
+        return self._version
+
+    def _ensure_collection(self, dimensions: int) -> None:
+        if self._dimensions == dimensions:
+            return
+        if self.client.collection_exists(COLLECTION_NAME):
+            vectors = self.client.get_collection(COLLECTION_NAME).config.params.vectors
+            if vectors.size != dimensions:
+                self.client.delete_collection(COLLECTION_NAME)
+        if not self.client.collection_exists(COLLECTION_NAME):
+            self.client.create_collection(
+                collection_name=COLLECTION_NAME,
+                vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE),
+            )
+            for field_name, schema in _PAYLOAD_INDEXES.items():
+                self.client.create_payload_index(
+                    collection_name=COLLECTION_NAME, field_name=field_name, field_schema=schema
+                )
+        self._dimensions = dimensions
+
+    def _filter(self, scope: str) -> models.Filter:
+        return models.Filter(
+            must=[
+                models.FieldCondition(key="index_version", match=models.MatchValue(value=self._current_version())),
+                models.FieldCondition(key="scope", match=models.MatchValue(value=scope)),
+                models.FieldCondition(key="created_at", range=models.Range(gte=time.time() - self.ttl_seconds)),
+            ]
+        )
+
+    def lookup(self, vector: list[float], scope: str = scope_key(None, None)) -> tuple[str, float] | None:
+        """`(answer, similarity)` of the closest cached question within the threshold, else None."""
+        if not self.client.collection_exists(COLLECTION_NAME):
+            self.misses += 1
+            return None
+        points = self.client.query_points(
+            collection_name=COLLECTION_NAME,
+            query=vector,
+            query_filter=self._filter(scope),
+            score_threshold=self.threshold,
+            limit=1,
+            with_payload=["answer"],
+        ).points
+        if not points:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return points[0].payload["answer"], points[0].score
+
+    def store(
+        self,
+        query: str,
+        vector: list[float],
+        answer: str,
+        chunk_ids: list[str],
+        scope: str = scope_key(None, None),
+    ) -> None:
+        self._ensure_collection(len(vector))
+        version = self._current_version()
+        # One entry per (version, scope, normalized question); re-asking overwrites it.
+        point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{version}|{scope}|{normalize_query(query)}"))
+        self.client.upsert(
+            collection_name=COLLECTION_NAME,
+            points=[
+                models.PointStruct(
+                    id=point_id,
+                    vector=vector,
+                    payload={
+                        "query": query,
+                        "answer": answer,
+                        "chunk_ids": chunk_ids,
+                        "index_version": version,
+                        "scope": scope,
+                        "created_at": time.time(),
+                    },
+                )
+            ],
+        )
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        return (
+            f"Answer cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hits / lookups if lookups else 0.0:.0%} hit rate, threshold {self.threshold:g})"
+        )
+
+
+def answer_cache_from_env(client: QdrantClient, index_collection: str) -> AnswerCache | None:
+    """Cache configured by ANSWER_CACHE / ANSWER_CACHE_THRESHOLD / ANSWER_CACHE_TTL (None when disabled)."""
+    if os.getenv("ANSWER_CACHE", "1") == "0":
+        return None
+    return AnswerCache(
+        client,
+        index_collection,
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", str(DEFAULT_THRESHOLD))),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", str(DEFAULT_TTL_SECONDS))),
+    )
@@ -0,0 +1,90 @@
+"""
+Benchmark: recall@k versus embedding dimension (Matryoshka truncation).
+
+Usage:
+    python benchmarks/bench_dimensions.py [--url http://localhost:6333 | --path QDRANT_PATH] [--collection learning_vectors]
+        [--dimensions 128,256,512,768,1536,3072] [--k 3,10] [--query-every 10]
+
+Reads the full-size vectors already stored in `--collection` (index with the
+default 3072 dimensions first; no embedding calls are made here), holds out
+every `--query-every`-th vector as a query, and for every dimension truncates
+and re-normalizes both sides the way `matryoshka.MatryoshkaEmbeddings` does.
+Reports vector storage, brute-force search time per query and recall@k
+against the full-dimension top-k.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+
+# Make the 05-rag-1 modules importable when run from anywhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hybrid import dense_vector
+from qdrant_backend import get_client
+
+
+def _flag_value(name, default):
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+def load_vectors(client: QdrantClient, collection_name: str) -> np.ndarray:
+    vectors, offset = [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name, limit=1000, offset=offset, with_payload=False, with_vectors=True
+        )
+        vectors.extend(dense_vector(point.vector) for point in points)
+        if offset is None:
+            return np.asarray(vectors, dtype=np.float32)
+
+
+def reduce(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    truncated = vectors[:, :dimensions]
+    return truncated / np.linalg.norm(truncated, axis=1, keepdims=True)
+
+
+def main():
+    client = get_client(_flag_value("--url", None), _flag_value("--path", None))
+    collection_name = _flag_value("--collection", "learning_vectors")
+    ks = [int(n) for n in _flag_value("--k", "3,10").split(",")]
+    query_every = int(_flag_value("--query-every", "10"))
+
+    vectors = load_vectors(client, collection_name)
+    if len(vectors) < query_every * 2:
+        raise SystemExit(f"Collection {collection_name} holds {len(vectors)} vectors; index more documents first.")
+    full = vectors.shape[1]
+    dimensions = [int(n) for n in _flag_value("--dimensions", "128,256,512,768,1536,3072").split(",")]
+    dimensions = [d for d in dimensions if d <= full]
+
+    is_query = np.arange(len(vectors)) % query_every == 0
+    base, queries = vectors[~is_query], vectors[is_query]
+    truth = np.argsort(-(reduce(queries, full) @ reduce(base, full).T), axis=1)[:, : max(ks)]
+    print(f"{collection_name}: {len(base)} vectors x {full} dims, {len(queries)} held-out queries")
+
+    header = f"{'dims':>6}{'MB':>9}{'ms/query':>10}"
+    for k in ks:
+        header += f"{f'recall@{k}':>11}"
+    print(header)
+    for dims in dimensions:
+        reduced_base, reduced_queries = reduce(base, dims), reduce(queries, dims)
+        started = time.perf_counter()
+        scores = reduced_queries @ reduced_base.T
+        found = np.argsort(-scores, axis=1)[:, : max(ks)]
+        per_query_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        row = f"{dims:>6}{reduced_base.size * 4 / 2**20:>9.2f}{per_query_ms:>10.3f}"
+        for k in ks:
+            hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+            row += f"{hits / (len(queries) * k):>11.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: serial PyPDFLoader vs. process-pool page extraction.
+
+Usage:
+    python benchmarks/bench_extraction.py [path/to.pdf] [--workers 1,2,4,8] [--repeat 3]
+
+Reports wall time, pages/s and speedup over the serial loader for each worker
+count, and checks that the parallel output matches the serial text and
+metadata page by page.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Make the 05-rag-1 modules importable when run from anywhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_community.document_loaders import PyPDFLoader
+
+from parallel_extract import extract_pages_parallel
+
+
+def _flag_value(name, default):
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+def _best_of(repeat, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    positional = [arg for arg in sys.argv[1:] if arg.endswith(".pdf")]
+    pdf_path = Path(positional[0]) if positional else Path(__file__).resolve().parent.parent / "nodejs.pdf"
+    default_workers = ",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1))
+    worker_counts = [int(n) for n in _flag_value("--workers", default_workers).split(",")]
+    repeat = int(_flag_value("--repeat", "3"))
+
+    serial_seconds, serial_pages = _best_of(
+        repeat, lambda: list(PyPDFLoader(str(pdf_path), mode="page").lazy_load())
+    )
+    page_total = len(serial_pages)
+    print(f"{pdf_path.name}: {page_total} pages, best of {repeat}")
+    print(f"{'mode':<18}{'seconds':>10}{'pages/s':>12}{'speedup':>10}{'identical':>11}")
+    print(f"{'serial PyPDFLoader':<18}{serial_seconds:>10.2f}{page_total / serial_seconds:>12.1f}{1.0:>10.2f}{'-':>11}")
+
+    for workers in worker_counts:
+        seconds, pages = _best_of(repeat, lambda: list(extract_pages_parallel(pdf_path, workers=workers)))
+        identical = [(p.page_content, p.metadata) for p in pages] == [
+            (p.page_content, p.metadata) for p in serial_pages
+        ]
+        print(
+            f"{f'parallel x{workers}':<18}{seconds:>10.2f}{page_total / seconds:>12.1f}"
+            f"{serial_seconds / seconds:>10.2f}{str(identical):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
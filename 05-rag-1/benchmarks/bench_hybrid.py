@@ -0,0 +1,87 @@
+"""
+Benchmark: dense vs hybrid (dense + BM25) retrieval on exact identifiers.
+
+Usage:
+    python benchmarks/bench_hybrid.py [--url http://localhost:6333 | --path QDRANT_PATH]
+        [--collection learning_vectors] [--queries 30] [--k 3]
+
+Needs a collection indexed with `indexing.py --run --hybrid`. Dotted
+identifiers that occur in only a few chunks (`app.listen`, `JSON.parse`, ...)
+are collected from the stored chunks, and every one of them is asked as
+"How do I use <identifier>?" with dense-only and with hybrid search. Reports
+hit@k (an answer chunk in the top k) and precision@k (share of the top k
+containing the identifier). Each query costs one embedding call
+(EMBED_DIMENSIONS must match the collection).
+"""
+
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+from langchain_qdrant import QdrantVectorStore
+
+# Make the 05-rag-1 modules importable when run from anywhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hybrid import has_sparse_vectors, make_vector_store, tokenize
+from matryoshka import embedding_dimensions, make_embeddings
+from qdrant_backend import get_client
+
+_MAX_CHUNKS_PER_IDENTIFIER = 5
+
+
+def _flag_value(name, default):
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+def rare_identifiers(texts: list[str]) -> list[str]:
+    """Dotted identifiers found in 1..N chunks."""
+    counts = Counter()
+    for text in texts:
+        counts.update({token for token in tokenize(text) if "." in token})
+    return sorted(token for token, count in counts.items() if count <= _MAX_CHUNKS_PER_IDENTIFIER)
+
+
+def main():
+    client = get_client(_flag_value("--url", None), _flag_value("--path", None))
+    collection_name = _flag_value("--collection", "learning_vectors")
+    queries = int(_flag_value("--queries", "30"))
+    k = int(_flag_value("--k", "3"))
+    if not has_sparse_vectors(client, collection_name):
+        raise SystemExit(f"Collection {collection_name} has no BM25 vectors; index it with --hybrid first.")
+
+    texts, offset = [], None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=1000, offset=offset, with_payload=True)
+        texts.extend(point.payload["page_content"] for point in points)
+        if offset is None:
+            break
+    identifiers = rare_identifiers(texts)
+    identifiers = random.Random(0).sample(identifiers, min(queries, len(identifiers)))
+    print(f"{collection_name}: {len(texts)} chunks, {len(identifiers)} identifier queries, k={k}")
+
+    embeddings = make_embeddings(embedding_dimensions())
+    stores = {
+        "dense": QdrantVectorStore(
+            client=client, collection_name=collection_name, embedding=embeddings, validate_collection_config=False
+        ),
+        "hybrid": make_vector_store(client, collection_name, embeddings),
+    }
+    print(f"{'mode':<8}{f'hit@{k}':>8}{f'precision@{k}':>14}")
+    for mode, store in stores.items():
+        hits = relevant = 0
+        for identifier in identifiers:
+            results = store.similarity_search(f"How do I use {identifier}?", k=k)
+            found = [identifier in tokenize(doc.page_content) for doc in results]
+            hits += any(found)
+            relevant += sum(found)
+        print(f"{mode:<8}{hits / len(identifiers):>8.3f}{relevant / (len(identifiers) * k):>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark: RAM and recall@k of quantized vector storage.
+
+Usage:
+    python benchmarks/bench_quantization.py [--url http://localhost:6333 | --path QDRANT_PATH] [--collection learning_vectors]
+        [--k 3,10] [--oversampling 2] [--query-every 10]
+
+Reads the vectors already indexed in `--collection` (run indexing.py first,
+no embedding calls are made here), holds out every `--query-every`-th vector
+as a query and loads the rest into temporary collections, one per
+quantization mode. For every mode it reports the RAM held by resident
+vectors and recall@k against exact float32 cosine search, with and without
+oversampling + rescoring.
+
+Needs a Qdrant server for meaningful numbers: embedded local mode (--path)
+ignores quantization and always searches exactly.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+# Make the 05-rag-1 modules importable when run from anywhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from hybrid import dense_vector
+from qdrant_backend import get_client
+from quantization import QUANTIZATION_MODES, quantization_config, ram_bytes
+
+_UPLOAD_BATCH = 256
+
+
+def _flag_value(name, default):
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+def load_vectors(client: QdrantClient, collection_name: str) -> np.ndarray:
+    vectors, offset = [], None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name, limit=1000, offset=offset, with_payload=False, with_vectors=True
+        )
+        vectors.extend(dense_vector(point.vector) for point in points)
+        if offset is None:
+            return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(base: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    base = base / np.linalg.norm(base, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ base.T), axis=1)[:, :k]
+
+
+def build_collection(client: QdrantClient, name: str, base: np.ndarray, mode: str) -> None:
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=base.shape[1], distance=models.Distance.COSINE, on_disk=mode != "none"),
+        quantization_config=None if mode == "none" else quantization_config(mode),
+    )
+    for start in range(0, len(base), _UPLOAD_BATCH):
+        client.upsert(
+            collection_name=name,
+            points=[
+                models.PointStruct(id=start + offset, vector=vector.tolist())
+                for offset, vector in enumerate(base[start : start + _UPLOAD_BATCH])
+            ],
+            wait=True,
+        )
+
+
+def recall(client: QdrantClient, name: str, queries: np.ndarray, truth: np.ndarray, k: int, params) -> float:
+    hits = 0
+    for query, expected in zip(queries, truth):
+        result = client.query_points(collection_name=name, query=query.tolist(), limit=k, search_params=params)
+        hits += len({point.id for point in result.points} & set(expected[:k].tolist()))
+    return hits / (len(queries) * k)
+
+
+def main():
+    client = get_client(_flag_value("--url", None), _flag_value("--path", None))
+    collection_name = _flag_value("--collection", "learning_vectors")
+    ks = [int(n) for n in _flag_value("--k", "3,10").split(",")]
+    oversampling = float(_flag_value("--oversampling", "2"))
+    query_every = int(_flag_value("--query-every", "10"))
+
+    vectors = load_vectors(client, collection_name)
+    if len(vectors) < query_every * 2:
+        raise SystemExit(f"Collection {collection_name} holds {len(vectors)} vectors; index more documents first.")
+    is_query = np.arange(len(vectors)) % query_every == 0
+    base, queries = vectors[~is_query], vectors[is_query]
+    truth = exact_top_k(base, queries, max(ks))
+    dimensions = base.shape[1]
+    print(f"{collection_name}: {len(base)} vectors x {dimensions} dims, {len(queries)} held-out queries")
+
+    plain = models.SearchParams(quantization=models.QuantizationSearchParams(rescore=False))
+    rescored = models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=oversampling)
+    )
+    header = f"{'mode':<8}{'RAM MB':>9}{'vs f32':>8}{'build s':>9}"
+    for k in ks:
+        header += f"{f'recall@{k}':>11}{f'+rescore':>10}"
+    print(header)
+    full = ram_bytes(len(base), dimensions, "none")
+    for mode in QUANTIZATION_MODES:
+        name = f"bench_quantization_{mode}"
+        started = time.perf_counter()
+        build_collection(client, name, base, mode)
+        build_seconds = time.perf_counter() - started
+        resident = ram_bytes(len(base), dimensions, mode)
+        row = f"{mode:<8}{resident / 2**20:>9.2f}{full / resident:>7.0f}x{build_seconds:>9.1f}"
+        try:
+            for k in ks:
+                row += f"{recall(client, name, queries, truth, k, plain):>11.3f}"
+                row += f"{recall(client, name, queries, truth, k, rescored):>10.3f}"
+        finally:
+            client.delete_collection(name)
+        print(row)
+    print(f"(+rescore: oversampling {oversampling:g}x on quantized vectors, rescored with on-disk originals)")
+
+
+if __name__ == "__main__":
+    main()
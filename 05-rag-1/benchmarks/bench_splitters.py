@@ -0,0 +1,92 @@
+"""
+Benchmark: text splitters used by indexing.py.
+
+Usage:
+    python benchmarks/bench_splitters.py [path/to.pdf] [--scale 1,10,100] [--repeat 3]
+
+The PDF text is extracted once and repeated `scale` times to simulate larger
+manuals. For every splitter it reports wall time, throughput (MB/s), peak
+memory allocated while splitting (tracemalloc, measured in a separate run so
+it doesn't slow down the timed ones), chunk count, the spread of tokens per
+chunk (counted with the gpt-4o tiktoken encoding), and whether the chunks
+are identical to RecursiveCharacterTextSplitter's.
+"""
+
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make the 05-rag-1 modules importable when run from anywhere.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from fast_splitter import FastRecursiveSplitter
+from token_splitter import TokenBudgetSplitter, get_encoding
+
+
+def _flag_value(name, default):
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+def splitters():
+    return {
+        "recursive chars (3000/200)": RecursiveCharacterTextSplitter(chunk_size=3000, chunk_overlap=200),
+        "fast chars (3000/200)": FastRecursiveSplitter(chunk_size=3000, chunk_overlap=200),
+        "token budget (750/50)": TokenBudgetSplitter(chunk_tokens=750, overlap_tokens=50),
+    }
+
+
+def peak_memory_mb(splitter, text):
+    tracemalloc.start()
+    try:
+        splitter.split_text(text)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    positional = [arg for arg in sys.argv[1:] if arg.endswith(".pdf")]
+    pdf_path = Path(positional[0]) if positional else Path(__file__).resolve().parent.parent / "nodejs.pdf"
+    scales = [int(n) for n in _flag_value("--scale", "1,10,100").split(",")]
+    repeat = int(_flag_value("--repeat", "3"))
+
+    base_text = PyPDFLoader(str(pdf_path), mode="single").load()[0].page_content
+    encoding = get_encoding()
+
+    for scale in scales:
+        text = base_text * scale
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+        print(f"\n{pdf_path.name} x{scale}: {megabytes:.1f} MB of text, best of {repeat}")
+        print(
+            f"{'splitter':<30}{'seconds':>9}{'MB/s':>8}{'peak MB':>9}{'chunks':>8}"
+            f"{'tok mean':>10}{'tok min':>9}{'tok max':>9}  same as recursive"
+        )
+        reference = None
+        for name, splitter in splitters().items():
+            best, chunks = float("inf"), []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                chunks = splitter.split_text(text)
+                best = min(best, time.perf_counter() - started)
+            if reference is None:
+                reference = chunks
+            peak = peak_memory_mb(splitter, text)
+            token_counts = [len(tokens) for tokens in encoding.encode_batch(chunks, disallowed_special=())]
+            print(
+                f"{name:<30}{best:>9.2f}{megabytes / best:>8.1f}{peak:>9.1f}{len(chunks):>8}"
+                f"{statistics.mean(token_counts):>10.0f}{min(token_counts):>9}{max(token_counts):>9}"
+                f"  {'yes' if chunks == reference else 'no'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
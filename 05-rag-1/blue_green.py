@@ -0,0 +1,116 @@
+"""
+Blue/green collection rebuilds behind a Qdrant alias.
+
+`--force-recreate` drops `learning_vectors` and refills it, so every query
+running meanwhile sees an empty or partial collection. A blue/green rebuild
+(`indexing.py --run --blue-green`) instead writes into a new versioned
+collection, `learning_vectors_v{N}`, at full speed while queries keep
+hitting the current one, then:
+
+1. warms it: waits for Qdrant's optimizers to finish building the HNSW
+   index (collection status green) and runs a few searches so the index
+   and vectors are paged in before live traffic arrives;
+2. repoints the `learning_vectors` alias in a single
+   `update_collection_aliases` call, which Qdrant applies atomically;
+3. deletes old versions, keeping the newest `keep` previous ones for a
+   quick rollback.
+
+`chat.py` and the RQ workers keep querying `learning_vectors`; Qdrant
+resolves the alias on every request, so they switch versions without a
+restart.
+
+Key behaviors:
+- The first blue/green rebuild migrates a plain `learning_vectors`
+  collection: it is deleted right before the alias is created, the only
+  moment (milliseconds) when the name resolves to nothing.
+- Versions newer than the live one are leftovers of failed rebuilds and
+  are always garbage-collected.
+"""
+
+import re
+import time
+
+from qdrant_client import QdrantClient, models
+
+from hybrid import dense_vector
+from quantization import search_params
+
+_WARM_POLL_SECONDS = 1.0
+
+
+def version_name(alias: str, version: int) -> str:
+    return f"{alias}_v{version}"
+
+
+def collection_versions(client: QdrantClient, alias: str) -> dict[int, str]:
+    """Map version number -> collection name for every `{alias}_v{N}` collection."""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    versions = {}
+    for collection in client.get_collections().collections:
+        match = pattern.match(collection.name)
+        if match:
+            versions[int(match.group(1))] = collection.name
+    return versions
+
+
+def alias_target(client: QdrantClient, alias: str) -> str | None:
+    """Name of the collection `alias` points to, None if there is no such alias."""
+    for description in client.get_aliases().aliases:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+
+def next_version(client: QdrantClient, alias: str) -> str:
+    """Name for the next versioned collection behind `alias`."""
+    return version_name(alias, max(collection_versions(client, alias), default=0) + 1)
+
+
+def warm_collection(client: QdrantClient, collection_name: str, queries: int = 8, timeout: float = 600.0) -> float:
+    """Wait until `collection_name` is fully indexed, then run `queries` searches; return seconds spent."""
+    started = time.perf_counter()
+    while client.get_collection(collection_name).status != models.CollectionStatus.GREEN:
+        if time.perf_counter() - started > timeout:
+            raise TimeoutError(f"Collection {collection_name} was not optimized within {timeout:.0f}s")
+        time.sleep(_WARM_POLL_SECONDS)
+    points, _ = client.scroll(collection_name=collection_name, limit=queries, with_payload=False, with_vectors=True)
+    for point in points:
+        client.query_points(
+            collection_name=collection_name, query=dense_vector(point.vector), limit=10, search_params=search_params()
+        )
+    return time.perf_counter() - started
+
+
+def swap_alias(client: QdrantClient, alias: str, collection_name: str) -> str | None:
+    """Atomically point `alias` at `collection_name`; return the previous target."""
+    previous = alias_target(client, alias)
+    if previous is None and client.collection_exists(alias):
+        # A plain collection still holds the alias name (pre blue/green setup).
+        client.delete_collection(alias)
+        previous = alias
+    operations = []
+    if previous is not None and previous != alias:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(
+        models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+        )
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+    return previous
+
+
+def garbage_collect(client: QdrantClient, alias: str, keep: int = 1) -> list[str]:
+    """Delete old versions behind `alias`, keeping the live one and `keep` predecessors."""
+    live = alias_target(client, alias)
+    versions = collection_versions(client, alias)
+    live_version = next((number for number, name in versions.items() if name == live), None)
+    if live_version is None:
+        # No versioned collection is live; never delete what may be serving.
+        return []
+    older = sorted((number for number in versions if number < live_version), reverse=True)
+    doomed = [versions[number] for number in older[keep:]]
+    doomed += [versions[number] for number in versions if number > live_version]
+    for name in doomed:
+        client.delete_collection(name)
+    return doomed
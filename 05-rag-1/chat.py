@@ -1,41 +1,100 @@
-from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 import os
 import sys
 import getpass
 from dotenv import load_dotenv
+from quantization import search_params
+from matryoshka import check_collection_dimensions, embedding_dimensions, make_embeddings
+from filters import build_filter, parse_page_range
+from qdrant_backend import get_client
+from hybrid import make_vector_store
+from query_cache import CachedQueryEmbeddings, query_cache_from_env
+from answer_cache import answer_cache_from_env, scope_key
+from context_packer import build_context, packer_from_env
+from pathlib import Path
 load_dotenv()
 if not os.getenv("GOOGLE_API_KEY"):
     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google API key: ")
 
 DRY_RUN = "--dry-run" in sys.argv
+
+
+def _flag_value(name, default):
+    """Return the value following `name` in sys.argv (e.g. `--pages 10-20`), or `default`."""
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+# Optional scope: --source path/to/file.pdf and/or --pages 10-20 (1-based, inclusive).
+SOURCE = _flag_value("--source", None)
+try:
+    PAGES = parse_page_range(_flag_value("--pages", None))
+except ValueError as exc:
+    raise SystemExit(f"--pages: {exc}")
+# Sources are stored as absolute paths by indexing.py.
+search_filter = build_filter(str(Path(SOURCE).resolve()) if SOURCE else None, PAGES)
 # Vector Embeddings
-embeddings_model=GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+# EMBED_DIMENSIONS must match the --dimensions the collection was indexed with.
+EMBED_DIMENSIONS = embedding_dimensions()
+embeddings_model=make_embeddings(EMBED_DIMENSIONS)
+# Query-embedding cache. In-process it saves the second embedding of the
+# question (answer-cache lookup, then search); repeats across runs only hit
+# when REDIS_URL points at the Redis the RQ workers share their cache through.
+redis = None
+if os.getenv("REDIS_URL"):
+    from redis import Redis
+    redis = Redis.from_url(os.environ["REDIS_URL"])
+query_cache = query_cache_from_env(redis=redis)
+if query_cache is not None:
+    embeddings_model = CachedQueryEmbeddings(embeddings_model, query_cache)
 
 
-vector_db=QdrantVectorStore.from_existing_collection(
-    url="http://localhost:6333",
-    collection_name="learning_vectors",
-    embedding=embeddings_model,
-)
+# Qdrant server (QDRANT_URL, default http://localhost:6333) or the embedded
+# local mode when QDRANT_PATH is set. Hybrid (dense + BM25) search when the
+# collection was indexed with --hybrid. The embedding dimension is checked
+# below from the collection config instead of embedding a probe text.
+vector_db=make_vector_store(get_client(), "learning_vectors", embeddings_model)
+check_collection_dimensions(vector_db.client, "learning_vectors", EMBED_DIMENSIONS)
 
 #Take User Input/Query
 
 query=input(">> Enter your query: ")
 
+# Semantic answer cache: a near-duplicate question already answered from the
+# current index (and the same --source/--pages scope) skips the LLM call.
+answer_cache = answer_cache_from_env(vector_db.client, "learning_vectors")
+scope = scope_key(str(Path(SOURCE).resolve()) if SOURCE else None, PAGES)
+query_vector = None
+if answer_cache is not None:
+    # The cache is optional: a failed lookup falls through to the search.
+    try:
+        query_vector = embeddings_model.embed_query(query)
+        cached = answer_cache.lookup(query_vector, scope)
+    except Exception as exc:
+        print(f"Answer cache lookup failed: {exc}")
+        cached = None
+        query_vector = None
+    if cached is not None:
+        print(f"Answer cache hit (similarity {cached[1]:.3f}); skipping retrieval and LLM call.")
+        print(f"Assistant: {cached[0]}")
+        raise SystemExit(0)
+
 #Vector Similarity Search in Vector DB
-search_results=vector_db.similarity_search(query, k=3)
-
-context = "\n\n\n".join(
-    [
-        f"Page Content: {result.page_content}\n"
-        f"Page Number: {result.metadata.get('page_label', 'N/A')}\n"
-        f"File Location: {result.metadata.get('source', 'N/A')}"
-        for result in search_results
-    ]
-)
+# On a quantized collection: search the in-RAM quantized vectors, oversample,
+# and rescore with the on-disk originals (ignored when not quantized).
+search_results=vector_db.similarity_search_with_score(query, k=3, filter=search_filter, search_params=search_params())
+if query_cache is not None:
+    print(query_cache.summary())
+
+# Context assembly: overlapping chunks of a source merged into one passage,
+# repeated text dropped, passages packed by score under CONTEXT_TOKEN_BUDGET
+# (the chunks as retrieved if packing fails).
+context, context_report = build_context(packer_from_env(), search_results)
+print(context_report)
 print("Context retrieved from vector store:")   
 
 if DRY_RUN:
@@ -65,4 +124,11 @@ try:
     print(f"Assistant: {response.content}")
 except Exception as exc:
     print("LLM call failed. If this is a quota issue, run with '--dry-run' to validate retrieval without API usage.")
-    print(f"Details: {exc}")
\ No newline at end of file
+    print(f"Details: {exc}")
+else:
+    if answer_cache is not None and query_vector is not None:
+        try:
+            chunk_ids = [str(result.metadata.get("_id")) for result, _ in search_results]
+            answer_cache.store(query, query_vector, response.content, chunk_ids, scope)
+        except Exception as exc:
+            print(f"Could not cache the answer: {exc}")
\ No newline at end of file
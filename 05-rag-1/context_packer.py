@@ -0,0 +1,236 @@
+"""
+Token-budgeted context assembly for the chat prompt.
+
+chat.py and the RQ worker used to paste the top-k search results verbatim
+into the system prompt. Neighbouring chunks share their 200-character
+overlap, identical PDFs produce identical chunks, and nothing bounds the
+prompt size, while input-token cost and LLM latency both grow with it.
+`ContextPacker` sits between the search and the prompt:
+
+1. merges chunks of the same source whose text overlaps (the tail of one
+   is the head of the other) into one passage, so the shared span appears
+   once;
+2. drops passages whose text is already contained in a better-scored one
+   (duplicated chunks, or the same text from another copy of a document);
+3. packs passages by score, best first, while they fit the token budget
+   (`CONTEXT_TOKEN_BUDGET`, default 3000); a passage that does not fit is
+   skipped for smaller ones, and a single best passage larger than the
+   whole budget is truncated.
+
+Tokens are counted with tiktoken (the `gpt-4o` encoding of
+token_splitter.py): an estimate of Gemini's count, consistent between the
+packed and the verbatim prompt, which is what the saving is measured on.
+
+Key behaviors:
+- Passages keep the `Page Content / Page Number / File Location` layout;
+  a merged passage reports its page range ("12-13").
+- `PackedContext.summary()` reports chunks in, passages out, tokens used and
+  tokens saved against the verbatim join, once per request.
+- `build_context` falls back to the verbatim join when packing fails (the
+  tiktoken encoding is downloaded on first use and may be unavailable), so
+  a request never fails on context assembly. A failed download is
+  remembered for the life of the process: later requests fall back at
+  once instead of waiting for the network again.
+"""
+
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from langchain_core.documents import Document
+
+from token_splitter import DEFAULT_MODEL, get_encoding
+
+DEFAULT_TOKEN_BUDGET = 3000
+# Shortest shared span treated as chunk overlap rather than coincidence.
+MIN_OVERLAP_CHARS = 40
+SEPARATOR = "\n\n\n"
+
+
+@lru_cache(maxsize=None)
+def _encoding_or_none(model: str):
+    """`get_encoding(model)`, or None (cached like a success) when it cannot be loaded."""
+    try:
+        return get_encoding(model)
+    except Exception as exc:
+        print(f"Could not load the tiktoken encoding for {model}: {exc}")
+        return None
+
+
+def format_chunk(page_content: str, page_label: str, source: str) -> str:
+    return f"Page Content: {page_content}\nPage Number: {page_label}\nFile Location: {source}"
+
+
+def verbatim_context(documents: list[Document]) -> str:
+    """The unpacked context: every chunk as retrieved."""
+    return SEPARATOR.join(
+        format_chunk(doc.page_content, doc.metadata.get("page_label", "N/A"), doc.metadata.get("source", "N/A"))
+        for doc in documents
+    )
+
+
+def overlap_length(head: str, tail: str, min_chars: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `head` that is a prefix of `tail` (0 below `min_chars`)."""
+    if min(len(head), len(tail)) < min_chars:
+        return 0
+    anchor = tail[:min_chars]
+    position = head.find(anchor, max(0, len(head) - len(tail)))
+    while position != -1:
+        if tail.startswith(head[position:]):
+            return len(head) - position
+        position = head.find(anchor, position + 1)
+    return 0
+
+
+@dataclass
+class _Passage:
+    text: str
+    source: str
+    score: float
+    pages: list[tuple[int, str]] = field(default_factory=list)
+    chunks: int = 1
+
+    @property
+    def page_label(self) -> str:
+        labels = [label for _, label in sorted(self.pages)]
+        if not labels:
+            return "N/A"
+        first, last = labels[0].split("-")[0], labels[-1].split("-")[-1]
+        return first if first == last else f"{first}-{last}"
+
+    def absorb(self, other: "_Passage", text: str) -> None:
+        self.text = text
+        self.score = max(self.score, other.score)
+        self.pages += other.pages
+        self.chunks += other.chunks
+
+
+def _passage(doc: Document, score: float) -> _Passage:
+    metadata = doc.metadata
+    page = metadata.get("page")
+    pages = [(page if isinstance(page, int) else -1, str(metadata["page_label"]))] if "page_label" in metadata else []
+    return _Passage(doc.page_content, str(metadata.get("source", "N/A")), score, pages)
+
+
+def _merge(first: _Passage, second: _Passage) -> str | None:
+    """Text of `first` and `second` as one passage, None if they do not overlap."""
+    if second.text in first.text:
+        return first.text
+    if first.text in second.text:
+        return second.text
+    if overlap := overlap_length(first.text, second.text):
+        return first.text + second.text[overlap:]
+    if overlap := overlap_length(second.text, first.text):
+        return second.text + first.text[overlap:]
+    return None
+
+
+@dataclass
+class PackedContext:
+    text: str
+    chunks: int
+    passages: int
+    tokens: int
+    verbatim_tokens: int
+    budget: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.verbatim_tokens - self.tokens
+
+    def summary(self) -> str:
+        return (
+            f"Context: {self.chunks} chunks -> {self.passages} passages, {self.tokens} tokens "
+            f"({self.tokens_saved} saved of {self.verbatim_tokens}, budget {self.budget})"
+        )
+
+
+class ContextPacker:
+    """Merge, deduplicate and budget retrieved chunks into a prompt context."""
+
+    def __init__(self, budget_tokens: int = DEFAULT_TOKEN_BUDGET, model: str = DEFAULT_MODEL):
+        self.budget_tokens = budget_tokens
+        self.model = model
+
+    @property
+    def encoding(self):
+        # Loaded on first use, so importing the worker (the API server does) stays cheap.
+        encoding = _encoding_or_none(self.model)
+        if encoding is None:
+            raise RuntimeError(f"tiktoken encoding for {self.model} is unavailable")
+        return encoding
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        return self.encoding.decode(self.encoding.encode(text, disallowed_special=())[: max(tokens, 0)])
+
+    def passages(self, results: list[tuple[Document, float]]) -> list[_Passage]:
+        """Overlapping chunks of a source merged, contained ones dropped, best score first."""
+        merged: list[_Passage] = []
+        for doc, score in sorted(results, key=lambda result: result[1], reverse=True):
+            passage = _passage(doc, score)
+            # Keep merging: a chunk can bridge two passages of the same source.
+            changed = True
+            while changed:
+                changed = False
+                for other in merged:
+                    if other.source != passage.source:
+                        continue
+                    text = _merge(other, passage)
+                    if text is not None:
+                        merged.remove(other)
+                        other.absorb(passage, text)
+                        passage = other
+                        changed = True
+                        break
+            merged.append(passage)
+        merged.sort(key=lambda passage: passage.score, reverse=True)
+        # The same text under another source (a copied PDF) is sent once.
+        unique: list[_Passage] = []
+        for passage in merged:
+            if not any(passage.text in kept.text for kept in unique):
+                unique.append(passage)
+        return unique
+
+    def pack(self, results: list[tuple[Document, float]]) -> PackedContext:
+        """Context for `results` (`(document, score)` pairs, as from `similarity_search_with_score`)."""
+        separator_tokens = self._count(SEPARATOR)
+        blocks, used = [], 0
+        for passage in self.passages(results):
+            block = format_chunk(passage.text, passage.page_label, passage.source)
+            cost = self._count(block) + (separator_tokens if blocks else 0)
+            if used + cost <= self.budget_tokens:
+                blocks.append(block)
+                used += cost
+            elif not blocks:
+                # Even the best passage alone exceeds the budget: send its head.
+                header = self._count(format_chunk("", passage.page_label, passage.source))
+                text = self._truncate(passage.text, self.budget_tokens - header)
+                blocks.append(format_chunk(text, passage.page_label, passage.source))
+                used = self._count(blocks[0])
+        text = SEPARATOR.join(blocks)
+        return PackedContext(
+            text=text,
+            chunks=len(results),
+            passages=len(blocks),
+            tokens=self._count(text),
+            verbatim_tokens=self._count(verbatim_context([doc for doc, _ in results])),
+            budget=self.budget_tokens,
+        )
+
+
+def build_context(packer: ContextPacker, results: list[tuple[Document, float]]) -> tuple[str, str]:
+    """`(context, report line)`: the packed context, or every chunk as retrieved if packing fails."""
+    try:
+        packed = packer.pack(results)
+    except Exception as exc:
+        report = f"Context packing failed ({exc}); using the chunks as retrieved."
+        return verbatim_context([doc for doc, _ in results]), report
+    return packed.text, packed.summary()
+
+
+def packer_from_env() -> ContextPacker:
+    """Packer with the budget set by CONTEXT_TOKEN_BUDGET."""
+    return ContextPacker(int(os.getenv("CONTEXT_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET))))
@@ -0,0 +1,225 @@
+"""
+Multi-document (directory / glob) ingestion helpers.
+
+`indexing.py --input DIR_OR_GLOB` indexes a whole corpus instead of the
+single `nodejs.pdf`:
+
+- `discover_files` expands a directory (recursively, `*.pdf`) or a glob
+  pattern into a sorted list of PDFs.
+- `FileManifest` remembers, per file, the mtime, size and SHA-256 it had
+  when it was last fully indexed. Files whose mtime and size are unchanged
+  are skipped without being read; files that were only touched (same hash)
+  are skipped too and their new mtime recorded.
+- `chunk_files_parallel` loads and splits files in a `ProcessPoolExecutor`
+  and yields each file's chunks in input order, with a bounded number of
+  files in flight. The order is deterministic so near-duplicate filtering
+  keeps the same copy (and point ID) on every run. The chunks feed one
+  shared embed/upsert pipeline, so every core parses PDFs while the
+  embedding quota is shared by all files.
+- `CorpusProgress` counts the chunks of every file through the upsert stage
+  and fires a callback once a file is completely stored, which is where the
+  caller prints per-file progress, deletes stale points and updates the
+  manifest. The pipeline runs the hook in a thread, so those blocking
+  calls never stall the event loop.
+"""
+
+import glob
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+from extract_cache import ExtractionCache, file_sha256
+from streaming import StreamingSplitter
+
+
+def discover_files(target: str | Path) -> list[Path]:
+    """PDFs under a directory (recursive) or matching a glob pattern, sorted."""
+    target = str(target)
+    if os.path.isdir(target):
+        paths = Path(target).rglob("*.pdf")
+    else:
+        paths = (Path(match) for match in glob.glob(target, recursive=True))
+    return sorted(path.resolve() for path in paths if path.is_file())
+
+
+@dataclass
+class FileState:
+    mtime_ns: int
+    size: int
+    sha256: str | None = None
+
+
+class FileManifest:
+    """SQLite record of the files that have been completely indexed."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " chunks INTEGER NOT NULL,"
+            " indexed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _stored(self, path: Path) -> FileState | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, sha256 FROM files WHERE path = ?", (str(path),)
+            ).fetchone()
+        return FileState(*row) if row else None
+
+    def check(self, path: Path) -> tuple[bool, FileState]:
+        """Return `(changed, current state)` for `path`.
+
+        The hash is only computed when the mtime or size differ from the
+        recorded ones; a file that was merely touched is reported unchanged
+        and its new mtime is recorded.
+        """
+        stat = path.stat()
+        current = FileState(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        stored = self._stored(path)
+        if stored is not None and (stored.mtime_ns, stored.size) == (current.mtime_ns, current.size):
+            current.sha256 = stored.sha256
+            return False, current
+        current.sha256 = file_sha256(path)
+        if stored is not None and stored.sha256 == current.sha256:
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                    (current.mtime_ns, current.size, str(path)),
+                )
+                self._conn.commit()
+            return False, current
+        return True, current
+
+    def mark_indexed(self, path: Path, state: FileState, chunks: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size, sha256, chunks, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), state.mtime_ns, state.size, state.sha256, chunks, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Set once per worker process by `_init_worker`.
+_worker_splitter: TextSplitter | None = None
+_worker_cache: ExtractionCache | None = None
+
+
+def _init_worker(splitter: TextSplitter, cache_path: str | None, cache_max_bytes: int) -> None:
+    global _worker_splitter, _worker_cache
+    _worker_splitter = splitter
+    _worker_cache = ExtractionCache(cache_path, max_bytes=cache_max_bytes) if cache_path else None
+
+
+def _chunk_file(path: str) -> list[Document]:
+    """Worker: load one PDF, concatenate its pages and split it, keeping page ranges."""
+    extract = lambda: PyPDFLoader(path, mode="page").lazy_load()
+    pages = _worker_cache.pages(path, extract) if _worker_cache is not None else extract()
+    return list(StreamingSplitter(_worker_splitter, window_chunks=None).split_pages(pages))
+
+
+def chunk_files_parallel(
+    paths: Iterable[Path],
+    splitter: TextSplitter,
+    workers: int | None = None,
+    cache: ExtractionCache | None = None,
+) -> Iterator[tuple[Path, list[Document]]]:
+    """Yield `(path, chunks)` per file, in the order of `paths`, split by `workers` processes.
+
+    With `cache`, workers read page text from (and add it to) the same
+    extraction cache file instead of parsing unchanged PDFs again.
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = iter(paths)
+    initargs = (splitter, str(cache.path) if cache else None, cache.max_bytes if cache else 0)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        in_flight: deque = deque()
+        # Every worker busy plus one file queued each, but no more: files are
+        # handed over in submission order (deduplication downstream keeps the
+        # first copy it sees), so at most this many finished files wait.
+        for path in pending:
+            in_flight.append((path, executor.submit(_chunk_file, str(path))))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            path, future = in_flight.popleft()
+            yield path, future.result()
+            next_path = next(pending, None)
+            if next_path is not None:
+                in_flight.append((next_path, executor.submit(_chunk_file, str(next_path))))
+
+
+class CorpusProgress:
+    """Track when every chunk of a file has gone through the upsert stage.
+
+    `expect(source, count, on_done)` registers a file once its chunks are
+    known; `batch_done` (the pipeline's `on_batch_done` hook) counts stored
+    chunks per source and calls `on_done()` when a file is complete.
+    """
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.completed_files = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._remaining: dict[str, int] = {}
+        self._callbacks: dict[str, Callable[[], None]] = {}
+
+    def expect(self, source: str, count: int, on_done: Callable[[], None]) -> None:
+        with self._lock:
+            self._remaining[source] = self._remaining.get(source, 0) + count
+            self._callbacks[source] = on_done
+            done = self._remaining[source] == 0
+        if done:
+            self._complete(source)
+
+    def batch_done(self, start: int, end: int, batch: list[Document]) -> None:
+        finished = []
+        with self._lock:
+            for document in batch:
+                source = document.metadata.get("source", "")
+                self._remaining[source] -= 1
+                if self._remaining[source] == 0:
+                    finished.append(source)
+        for source in finished:
+            self._complete(source)
+
+    def _complete(self, source: str) -> None:
+        with self._lock:
+            del self._remaining[source]
+            callback = self._callbacks.pop(source)
+            self.completed_files += 1
+        callback()
+
+    def prefix(self) -> str:
+        """`[done/total, elapsed]` prefix for per-file progress lines."""
+        return f"[{self.completed_files}/{self.total_files}, {time.monotonic() - self.started:.0f}s]"
@@ -0,0 +1,119 @@
+"""
+Near-duplicate chunk elimination (MinHash + LSH banding).
+
+Technical PDFs repeat running headers, footers, license boilerplate and code
+listings, and the 200-character overlap makes neighbouring chunks of such
+pages look almost the same. Embedding and storing each copy costs quota and
+only crowds the top-k with the same text.
+
+`NearDuplicateFilter` sits in front of the embedding batches:
+
+- every chunk is reduced to a MinHash signature over word 3-gram shingles of
+  its normalized text (`num_perm` multiply-shift hash functions, computed
+  with numpy);
+- signatures are cut into `bands` x `rows` and bucketed per band (LSH), so
+  a new chunk is only compared with chunks sharing at least one band;
+- a candidate whose estimated Jaccard similarity is >= `threshold` marks
+  the chunk as a near-duplicate, and it is dropped. The first occurrence is
+  kept, so the outcome is the same on every run over the same document.
+
+Dropped chunks never reach `embed_documents` and never become points;
+`summary()` reports how many embedding requests and vectors that saved.
+"""
+
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+
+from embedding_cache import normalize_text
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_NUM_PERM = 128
+SHINGLE_WORDS = 3
+
+# Fixed seed: signatures (and therefore which chunk is kept) are reproducible.
+_SEED = 0x5EED
+
+
+def _shingles(text: str) -> set[int]:
+    """CRC32 hashes of the word 3-grams of the normalized, lowercased text."""
+    words = normalize_text(text).lower().split(" ")
+    if len(words) <= SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i : i + SHINGLE_WORDS]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def optimal_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """`(bands, rows)` whose LSH S-curve crosses 50% closest to `threshold`."""
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        # Similarity at which a pair becomes a candidate with probability ~1/2.
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateFilter:
+    """Streaming near-duplicate detector for chunks, in document order."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        rng = np.random.default_rng(_SEED)
+        # Odd multipliers for multiply-shift hashing; uint64 wrap-around is intended.
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: list[np.ndarray] = []
+        self.seen = 0
+        self.dropped = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = np.fromiter(_shingles(text), dtype=np.uint64)
+        hashes = (np.outer(shingles, self._a) + self._b) >> np.uint64(32)
+        return hashes.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes() for band in range(self.bands)
+        ]
+
+    def is_duplicate(self, document: Document) -> bool:
+        """True when `document` is a near-duplicate of a chunk kept earlier.
+
+        Kept chunks are added to the index; dropped ones are not, so a chain
+        of small edits can't drift arbitrarily far from the kept original.
+        """
+        self.seen += 1
+        signature = self.signature(document.page_content)
+        keys = self._band_keys(signature)
+        candidates: set[int] = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for candidate in candidates:
+            if np.count_nonzero(self._signatures[candidate] == signature) / self.num_perm >= self.threshold:
+                self.dropped += 1
+                return True
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, keys):
+            bucket.setdefault(key, []).append(index)
+        return False
+
+    def summary(self, batch_size: int | None = None) -> str:
+        calls = f" in {-(-self.dropped // batch_size)} fewer batch calls" if batch_size and self.dropped else ""
+        return (
+            f"Near-duplicate filter (threshold {self.threshold:.2f}, {self.bands}x{self.rows} LSH bands): "
+            f"dropped {self.dropped} of {self.seen} chunks, saving {self.dropped} embedding requests{calls} "
+            f"and {self.dropped} stored vectors."
+        )
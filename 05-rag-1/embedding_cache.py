@@ -0,0 +1,226 @@
+"""
+Content-addressed on-disk cache for document embeddings.
+
+Re-indexing used to send every chunk back through
+`GoogleGenerativeAIEmbeddings.embed_documents`, even when the text had not
+changed. `CachedEmbeddings` wraps any LangChain `Embeddings` object and keeps
+the vectors in a small SQLite file keyed by
+
+    (model name, task type, output dimensionality, normalized chunk hash)
+
+so unchanged chunks are served from disk and only new text costs an API call.
+
+Key behaviors:
+- Size-bounded: least-recently-used rows are evicted once the file holds more
+  than `max_bytes` of vectors.
+- Hit / miss counters are exposed through `EmbeddingCache.stats()`.
+- Vectors are stored as packed float32, so a 3072-d vector costs 12 KiB.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_TASK_TYPE = "RETRIEVAL_DOCUMENT"
+
+# Evict down to this fraction of the cap so we don't evict on every insert.
+_EVICT_TARGET = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Normalize chunk text so cosmetic whitespace changes still hit the cache."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the normalized chunk text."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed vector cache with LRU eviction and hit/miss statistics."""
+
+    def __init__(self, path: str | Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, task_type: str | None, dimensions: int | None, chunk_hash: str) -> str:
+        return f"{model}|{task_type or DEFAULT_TASK_TYPE}|{dimensions or 0}|{chunk_hash}"
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Return the cached vectors for `keys` (missing keys are absent)."""
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits bound parameters per statement; query in slices.
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def contains_many(self, keys: list[str]) -> set[str]:
+        """Return which of `keys` are cached, without touching statistics."""
+        present: set[str] = set()
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                present.update(key for (key,) in rows)
+        return present
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        """Store vectors and evict the least recently used rows if over the cap."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = array("f", vector).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            for key, _, size, _ in rows:
+                previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._total_bytes += size - (previous[0] if previous else 0)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * _EVICT_TARGET)
+        cursor = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC")
+        doomed = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, "
+            f"{stats['bytes'] / (1024 * 1024):.1f} MiB, {stats['evictions']} evicted"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """`Embeddings` wrapper that serves document vectors from an `EmbeddingCache`.
+
+    Only `embed_documents` is cached; queries go straight to the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def _keys(self, texts: list[str]) -> list[str]:
+        model = getattr(self.embeddings, "model", type(self.embeddings).__name__)
+        task_type = getattr(self.embeddings, "task_type", None)
+        dimensions = getattr(self.embeddings, "output_dimensionality", None)
+        return [EmbeddingCache.make_key(model, task_type, dimensions, text_hash(text)) for text in texts]
+
+    def uncached(self, texts: list[str]) -> list[str]:
+        """Texts that would need an API call (used to size rate-limit requests)."""
+        keys = self._keys(texts)
+        present = self.cache.contains_many(keys)
+        return [text for text, key in zip(texts, keys) if key not in present]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = self._keys(texts)
+        found = self.cache.get_many(keys)
+        # Embed each missing text once, even if it appears twice in the batch.
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = self._keys(texts)
+        found = self.cache.get_many(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
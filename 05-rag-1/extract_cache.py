@@ -0,0 +1,234 @@
+"""
+Cache of extracted PDF page text.
+
+pypdf text extraction takes seconds to minutes on large manuals, and every
+dry run, chunking experiment or re-index used to pay it again. The
+`ExtractionCache` keeps the per-page text (and page metadata) of every PDF
+it has seen in a SQLite file, compressed with zstandard, keyed by
+
+    (SHA-256 of the file content, parser version, extractor)
+
+so an unchanged file is never parsed twice, an edited file is re-parsed,
+and upgrading pypdf / langchain-community or changing the extraction
+settings (`PARSER_VERSION`) invalidates everything extracted before. The
+extractor (`PyPDFLoader`, or `parallel_extract` with --extract-workers)
+is part of the key, so pages cached by one path are never served as the
+other's.
+
+Key behaviors:
+- Pages are written while they are extracted, `_WRITE_BATCH` at a time,
+  under a pending key, so a miss holds one batch in memory however long the
+  document (streaming ingestion stays flat). The entry becomes readable
+  only once the last page is written; an interrupted extraction leaves no
+  partial entry.
+- Size-bounded: least-recently-used documents are evicted once the
+  compressed pages exceed `max_bytes`.
+- Explicit invalidation: `invalidate(path)` for one file, `clear()` for all
+  (including pending pages left behind by a killed process).
+- Safe to share between processes (SQLite WAL + busy timeout), so corpus
+  workers use the same file.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from importlib.metadata import version
+from pathlib import Path
+from typing import Callable, Iterator
+
+import zstandard
+from langchain_core.documents import Document
+
+# Bump the trailing number when the way pages are extracted changes.
+PARSER_VERSION = f"pypdf-{version('pypdf')}|langchain-community-{version('langchain-community')}|plain|1"
+DEFAULT_EXTRACTOR = "PyPDFLoader"
+
+_HASH_BLOCK = 1024 * 1024
+_EVICT_TARGET = 0.9
+_ZSTD_LEVEL = 3
+# Pages decompressed per query while reading a document back.
+_READ_BATCH = 64
+# Pages compressed in memory before they are written while extracting.
+_WRITE_BATCH = 64
+_PENDING_PREFIX = "pending-"
+
+
+def file_sha256(path: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while block := handle.read(_HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """SQLite + zstandard store of per-page PDF text."""
+
+    def __init__(self, path: str | Path, max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._compressor = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " key TEXT PRIMARY KEY,"
+            " file_hash TEXT NOT NULL,"
+            " pages INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT NOT NULL,"
+            " number INTEGER NOT NULL,"
+            " metadata TEXT NOT NULL,"
+            " text BLOB NOT NULL,"
+            " PRIMARY KEY (key, number))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_last_used ON documents(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(file_hash: str, extractor: str = DEFAULT_EXTRACTOR) -> str:
+        return f"{file_hash}|{PARSER_VERSION}|{extractor}"
+
+    def _lookup(self, key: str) -> int | None:
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM documents WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE documents SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return row[0] if row else None
+
+    def _read(self, key: str, source: str) -> Iterator[Document]:
+        number = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT number, metadata, text FROM pages WHERE key = ? AND number >= ? ORDER BY number LIMIT ?",
+                    (key, number, _READ_BATCH),
+                ).fetchall()
+            if not rows:
+                return
+            for number, metadata, blob in rows:
+                # The source is stored per lookup, not per file content: the
+                # same bytes may live under several paths.
+                metadata = json.loads(metadata) | {"source": source}
+                yield Document(page_content=self._decompressor.decompress(blob).decode("utf-8"), metadata=metadata)
+            number += 1
+
+    def _write_pages(self, rows: list[tuple[str, int, str, bytes]]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT INTO pages (key, number, metadata, text) VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def _complete(self, pending: str, key: str, file_hash: str, pages: int, size: int) -> None:
+        """Publish the pages written under `pending` as the entry `key`."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self._conn.execute("UPDATE pages SET key = ? WHERE key = ?", (key, pending))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (key, file_hash, pages, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, file_hash, pages, size, time.time()),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(total)
+            self._conn.commit()
+
+    def _discard(self, pending: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE key = ?", (pending,))
+            self._conn.commit()
+
+    def _evict(self, total: int) -> None:
+        target = int(self.max_bytes * _EVICT_TARGET)
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM documents ORDER BY last_used ASC"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", doomed)
+        self._conn.executemany("DELETE FROM documents WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def pages(
+        self,
+        path: str | Path,
+        extract: Callable[[], Iterator[Document]],
+        extractor: str = DEFAULT_EXTRACTOR,
+    ) -> Iterator[Document]:
+        """Yield the page documents of `path`, from the cache or via `extract()` (named `extractor`).
+
+        On a miss the pages are passed through as `extract()` yields them,
+        written in batches as they go, and published once the last one has
+        been read.
+        """
+        file_hash = file_sha256(path)
+        key = self.make_key(file_hash, extractor)
+        if self._lookup(key) is not None:
+            self.hits += 1
+            yield from self._read(key, str(path))
+            return
+        self.misses += 1
+        # Unique per extraction: concurrent misses on the same file do not mix pages.
+        pending = f"{_PENDING_PREFIX}{uuid.uuid4().hex}|{key}"
+        rows, pages, size = [], 0, 0
+        complete = False
+        try:
+            for number, page in enumerate(extract()):
+                metadata = {k: v for k, v in page.metadata.items() if k != "source"}
+                blob = self._compressor.compress(page.page_content.encode("utf-8"))
+                rows.append((pending, number, json.dumps(metadata), blob))
+                pages, size = number + 1, size + len(blob)
+                if len(rows) >= _WRITE_BATCH:
+                    self._write_pages(rows)
+                    rows = []
+                yield page
+            self._write_pages(rows)
+            self._complete(pending, key, file_hash, pages, size)
+            complete = True
+        finally:
+            if not complete:
+                self._discard(pending)
+
+    def invalidate(self, path: str | Path) -> None:
+        """Drop every cached extraction of the current content of `path`."""
+        file_hash = file_sha256(path)
+        with self._lock:
+            keys = [row for row in self._conn.execute("SELECT key FROM documents WHERE file_hash = ?", (file_hash,))]
+            self._conn.executemany("DELETE FROM pages WHERE key = ?", keys)
+            self._conn.executemany("DELETE FROM documents WHERE key = ?", keys)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+    def summary(self) -> str:
+        with self._lock:
+            documents, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+        return (
+            f"Extraction cache: {self.hits} hits, {self.misses} misses, {documents} documents, "
+            f"{size / (1024 * 1024):.1f} MiB compressed, {self.evictions} evicted"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
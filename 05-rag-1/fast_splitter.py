@@ -0,0 +1,146 @@
+"""
+Offset-based drop-in replacement for `RecursiveCharacterTextSplitter`.
+
+LangChain's recursive splitter re-splits the text with `re.split` at every
+separator level, glues every separator back onto its piece, joins the merged
+pieces into new strings and re-slices its merge window (`current_doc[1:]`)
+for every piece it drops. On a large manual that is a lot of short-lived
+strings.
+
+`FastRecursiveSplitter` keeps the same algorithm but works on offsets into
+the original text:
+
+- each level finds its separators with one `pattern.finditer(text, start,
+  end)` pass over the range being split, without copying it;
+- pieces are `(start, end)` spans; because separators are kept at the start
+  of the following piece, the pieces of a level tile the range exactly, so a
+  merged chunk is simply `text[first.start:last.end]`;
+- merging bisects the piece boundaries for each cut and overlap start, so
+  its cost grows with the number of chunks, not pieces, and whitespace is
+  stripped by moving the span ends, so every chunk is sliced exactly once.
+
+With the default separators (`["\\n\\n", "\\n", " ", ""]`), `keep_separator`
+on, whitespace stripping on and `len` as length function, its output is
+identical to `RecursiveCharacterTextSplitter`. `split_spans` exposes the
+chunk offsets for callers that need to map chunks back to the source text.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterator, Sequence
+
+from langchain_text_splitters import TextSplitter
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class FastRecursiveSplitter(TextSplitter):
+    """Same chunks as `RecursiveCharacterTextSplitter`, computed over offsets."""
+
+    def __init__(
+        self,
+        separators: list[str] | None = None,
+        is_separator_regex: bool = False,
+        keep_separator: bool | str = True,
+        **kwargs: Any,
+    ):
+        if keep_separator not in (True, "start"):
+            raise ValueError("FastRecursiveSplitter only supports keep_separator=True / 'start'")
+        if kwargs.get("length_function", len) is not len:
+            raise ValueError("FastRecursiveSplitter measures chunks in characters (length_function=len)")
+        super().__init__(keep_separator=keep_separator, **kwargs)
+        self._separators = separators or DEFAULT_SEPARATORS
+        # None stands for the "" separator (split into characters).
+        self._patterns = [
+            (re.compile(separator if is_separator_regex else re.escape(separator)) if separator else None)
+            for separator in self._separators
+        ]
+
+    def _boundaries(self, text: str, start: int, end: int, pattern: re.Pattern | None) -> Sequence[int]:
+        """Piece boundaries of `text[start:end]`: the range ends plus every separator start."""
+        if pattern is None:
+            return range(start, end + 1)
+        bounds = [match.start() for match in pattern.finditer(text, start, end)]
+        if not bounds or bounds[0] != start:
+            bounds.insert(0, start)
+        bounds.append(end)
+        return bounds
+
+    def _strip(self, text: str, start: int, end: int) -> tuple[int, int] | None:
+        if self._strip_whitespace:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+        return (start, end) if end > start else None
+
+    def _merge(self, text: str, bounds: Sequence[int], first: int, last: int) -> Iterator[tuple[int, int]]:
+        """Merge the pieces between `bounds[first]` and `bounds[last]` into chunks.
+
+        Same rules as `TextSplitter._merge_splits`, but instead of walking the
+        pieces one by one it bisects the boundaries for the next cut and for
+        the start of the overlap, so the cost is per chunk, not per piece.
+        """
+        size, overlap = self._chunk_size, self._chunk_overlap
+        low, piece = first, first
+        while True:
+            # First boundary that no longer fits in a window starting at `low`.
+            over = bisect_right(bounds, bounds[low] + size, piece + 1, last + 1)
+            if over > last:
+                break
+            cut = over - 1
+            span = self._strip(text, bounds[low], bounds[cut])
+            if span is not None:
+                yield span
+            # Drop pieces from the front until what is left fits the overlap
+            # and leaves room for the piece that did not fit.
+            low = min(
+                cut,
+                max(
+                    bisect_left(bounds, bounds[cut] - overlap, low, cut),
+                    bisect_left(bounds, bounds[over] - size, low, cut),
+                ),
+            )
+            piece = cut
+        span = self._strip(text, bounds[low], bounds[last])
+        if span is not None:
+            yield span
+
+    def _spans(self, text: str, start: int, end: int, level: int) -> Iterator[tuple[int, int]]:
+        # Pick the first separator (from `level` on) that occurs in the range,
+        # exactly like RecursiveCharacterTextSplitter._split_text.
+        pattern, next_level = self._patterns[-1], None
+        for index in range(level, len(self._patterns)):
+            candidate = self._patterns[index]
+            if candidate is None:
+                pattern = None
+                break
+            if candidate.search(text, start, end):
+                pattern, next_level = candidate, index + 1
+                break
+        if next_level is not None and next_level >= len(self._patterns):
+            next_level = None
+
+        bounds = self._boundaries(text, start, end, pattern)
+        size = self._chunk_size
+        # Pieces too long to merge are split further (or emitted as-is); the
+        # runs of pieces between them are merged.
+        first = 0
+        for piece in [k for k in range(len(bounds) - 1) if bounds[k + 1] - bounds[k] >= size]:
+            if piece > first:
+                yield from self._merge(text, bounds, first, piece)
+            if next_level is None:
+                # No finer separator left: emitted as-is (not stripped), like LangChain.
+                yield bounds[piece], bounds[piece + 1]
+            else:
+                yield from self._spans(text, bounds[piece], bounds[piece + 1], next_level)
+            first = piece + 1
+        if len(bounds) - 1 > first:
+            yield from self._merge(text, bounds, first, len(bounds) - 1)
+
+    def split_spans(self, text: str) -> list[tuple[int, int]]:
+        """`(start, end)` offsets of the chunks in `text`."""
+        return list(self._spans(text, 0, len(text), 0))
+
+    def split_text(self, text: str) -> list[str]:
+        return [text[start:end] for start, end in self._spans(text, 0, len(text), 0)]
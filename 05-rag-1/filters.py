@@ -0,0 +1,55 @@
+"""
+Payload indexes and scoped-query filters.
+
+Without payload indexes a filtered search makes Qdrant check the payload of
+every candidate, so queries scoped to one document degrade linearly with the
+collection. `indexing.py` creates a keyword index on `metadata.source` and
+integer indexes on `metadata.page` / `metadata.page_end` (the first and last
+page a chunk spans); with them Qdrant evaluates `build_filter`
+conditions during HNSW traversal (and picks a payload-index-first plan for
+very selective filters).
+
+Page numbers on the command line and in the API are 1-based, as shown by a
+PDF viewer; `metadata.page` is PyPDFLoader's 0-based page index. A page
+range matches every chunk that overlaps it.
+"""
+
+from qdrant_client import QdrantClient, models
+
+PAYLOAD_INDEXES = {
+    "metadata.source": models.PayloadSchemaType.KEYWORD,
+    "metadata.page": models.PayloadSchemaType.INTEGER,
+    "metadata.page_end": models.PayloadSchemaType.INTEGER,
+}
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str) -> None:
+    """Create the payload indexes that are missing from the collection."""
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name not in existing:
+            client.create_payload_index(collection_name=collection_name, field_name=field_name, field_schema=schema)
+
+
+def parse_page_range(text: str | None) -> tuple[int, int] | None:
+    """Parse "12" or "10-20" (1-based, inclusive) into a `(first, last)` tuple."""
+    if not text:
+        return None
+    first, _, last = text.partition("-")
+    first_page, last_page = int(first), int(last or first)
+    if first_page < 1 or last_page < first_page:
+        raise ValueError(f"Invalid page range {text!r}; expected N or N-M with 1 <= N <= M")
+    return first_page, last_page
+
+
+def build_filter(source: str | None = None, pages: tuple[int, int] | None = None) -> models.Filter | None:
+    """Filter restricting a search to one source file and/or a page range."""
+    conditions = []
+    if source:
+        conditions.append(models.FieldCondition(key="metadata.source", match=models.MatchValue(value=source)))
+    if pages:
+        # Chunks span `page`..`page_end`; keep those overlapping the range.
+        first_page, last_page = pages
+        conditions.append(models.FieldCondition(key="metadata.page", range=models.Range(lte=last_page - 1)))
+        conditions.append(models.FieldCondition(key="metadata.page_end", range=models.Range(gte=first_page - 1)))
+    return models.Filter(must=conditions) if conditions else None
@@ -0,0 +1,129 @@
+"""
+Hybrid retrieval: dense embeddings plus locally computed BM25 sparse vectors.
+
+Dense similarity alone misses exact identifiers such as `fs.readFileSync`:
+the embedding of "how does fs.readFileSync work" lands near every chunk
+about reading files. A keyword (BM25) score ranks the chunks that contain
+the identifier itself first. `indexing.py --hybrid` stores a sparse vector
+named `bm25` next to the dense vector of every point, and queries fuse
+both rankings server-side (langchain_qdrant's `RetrievalMode.HYBRID`:
+one dense and one sparse prefetch, combined with reciprocal rank fusion).
+
+The sparse vectors are computed here, without any API call:
+- tokens are lower-cased words and dotted identifiers; `fs.readFileSync`
+  yields `fs.readfilesync`, `fs` and `readfilesync`;
+- token ids are CRC32 hashes, so no vocabulary has to be stored or shared;
+- document weights are BM25 term frequencies,
+  tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length));
+- the IDF part is left to Qdrant (`Modifier.IDF` on the sparse vector),
+  which keeps it current as points are added or deleted;
+- query weights are 1 per distinct token.
+
+Key behaviors:
+- `make_vector_store` detects from the collection config whether it holds
+  sparse vectors, so chat.py and the RQ worker switch to hybrid search
+  once the collection has been rebuilt with `--hybrid`.
+- Sparse vectors cannot be added to an existing collection; enabling
+  `--hybrid` needs `--force-recreate` or `--blue-green`.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+from langchain_qdrant.sparse_embeddings import SparseEmbeddings, SparseVector
+from qdrant_client import QdrantClient, models
+
+SPARSE_VECTOR_NAME = "bm25"
+K1 = 1.2
+B = 0.75
+# Roughly the word count of a 3000-character chunk.
+AVG_DOC_TOKENS = 450
+
+# Words and dotted identifiers (`fs.readFileSync`, `process.env.PORT`).
+_TOKEN = re.compile(r"[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*|\d+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in into is it its of on or so that the "
+    "their then there these this to was we what when where which will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if "." in token:
+            tokens.append(token)
+            tokens.extend(token.split("."))
+        elif token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def _token_id(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class BM25SparseEmbeddings(SparseEmbeddings):
+    """BM25 term-frequency sparse vectors (IDF applied by Qdrant)."""
+
+    def __init__(self, k1: float = K1, b: float = B, avg_doc_tokens: float = AVG_DOC_TOKENS):
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_tokens = avg_doc_tokens
+
+    def _weights(self, counts: Counter, length: int) -> SparseVector:
+        norm = self.k1 * (1 - self.b + self.b * length / self.avg_doc_tokens)
+        weights: dict[int, float] = {}
+        for token, tf in counts.items():
+            index = _token_id(token)
+            weights[index] = weights.get(index, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return SparseVector(indices=list(weights), values=list(weights.values()))
+
+    def embed_documents(self, texts: list[str]) -> list[SparseVector]:
+        vectors = []
+        for text in texts:
+            tokens = tokenize(text)
+            vectors.append(self._weights(Counter(tokens), len(tokens)))
+        return vectors
+
+    def embed_query(self, text: str) -> SparseVector:
+        indices = sorted({_token_id(token) for token in tokenize(text)})
+        return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+
+def sparse_vectors_config() -> dict[str, models.SparseVectorParams]:
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+
+def has_sparse_vectors(client: QdrantClient, collection_name: str) -> bool:
+    sparse = client.get_collection(collection_name).config.params.sparse_vectors or {}
+    return SPARSE_VECTOR_NAME in sparse
+
+
+def dense_vector(vector):
+    """The dense part of a point's vector (a dict once sparse vectors are stored)."""
+    return vector[""] if isinstance(vector, dict) else vector
+
+
+def make_vector_store(client: QdrantClient, collection_name: str, embedding: Embeddings) -> QdrantVectorStore:
+    """Vector store over `collection_name`, hybrid if the collection holds BM25 vectors."""
+    if client.collection_exists(collection_name) and has_sparse_vectors(client, collection_name):
+        return QdrantVectorStore(
+            client=client,
+            collection_name=collection_name,
+            embedding=embedding,
+            retrieval_mode=RetrievalMode.HYBRID,
+            sparse_embedding=BM25SparseEmbeddings(),
+            sparse_vector_name=SPARSE_VECTOR_NAME,
+            # The embedding dimension is checked separately (matryoshka).
+            validate_collection_config=False,
+        )
+    return QdrantVectorStore(
+        client=client,
+        collection_name=collection_name,
+        embedding=embedding,
+        validate_collection_config=False,
+    )
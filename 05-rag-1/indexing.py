@@ -1,91 +1,600 @@
 import getpass
 import os
 import sys
-import time
 from dotenv import load_dotenv
 load_dotenv()
-if not os.getenv("GOOGLE_API_KEY"):
-    os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google API key: ")
 
+import asyncio
 from pathlib import Path
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
+from qdrant_client import models
 import traceback
+from rate_limiter import CHARS_PER_TOKEN, QuotaRateLimiter, estimate_tokens
+from embedding_cache import CachedEmbeddings, EmbeddingCache, text_hash
+from incremental import IncrementalSync, delete_points, document_point_id, existing_point_ids
+from pipeline import IngestionPipeline, PipelineConfig
+from journal import IndexJournal, confirmed_hashes
+from streaming import StreamingSplitter, batched
+from parallel_extract import EXTRACTOR as PARALLEL_EXTRACTOR, extract_pages_parallel, join_pages
+from token_splitter import TokenBudgetSplitter
+from fast_splitter import FastRecursiveSplitter
+from dedup import DEFAULT_THRESHOLD, NearDuplicateFilter
+from extract_cache import DEFAULT_EXTRACTOR, ExtractionCache
+from corpus import CorpusProgress, FileManifest, chunk_files_parallel, discover_files
+from quantization import QUANTIZATION_MODES, apply_quantization
+from filters import ensure_payload_indexes
+from blue_green import alias_target, garbage_collect, next_version, swap_alias, warm_collection
+from matryoshka import FULL_DIMENSIONS, DimensionMismatchError, check_collection_dimensions, make_embeddings, record_dimensions
+from qdrant_backend import describe, get_async_client, get_client
+from hybrid import BM25SparseEmbeddings, has_sparse_vectors, make_vector_store, sparse_vectors_config
+from answer_cache import bump_index_version, index_version, invalidate as invalidate_answers, invalidate_chunks
+
+
+def _flag_value(name, default):
+    """Return the value following `name` in sys.argv (e.g. `--rpm 100`), or `default`."""
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
 
 RUN_INDEXING = "--run" in sys.argv
-FORCE_RECREATE = "--force-recreate" in sys.argv
+# Pick up an interrupted run where the checkpoint journal left off.
+RESUME = "--resume" in sys.argv
+# A resumed run must never drop the collection it is resuming into.
+FORCE_RECREATE = "--force-recreate" in sys.argv and not RESUME
+# Diff against what is already stored: embed only new/changed chunks, delete stale ones.
+INCREMENTAL = "--incremental" in sys.argv
 
-pdf_path=Path(__file__).parent / "nodejs.pdf"
+# Qdrant server URL, or a directory (":memory:" for none) for the embedded
+# local mode; default QDRANT_URL / QDRANT_PATH, else http://localhost:6333.
+QDRANT_URL = _flag_value("--qdrant-url", None)
+QDRANT_PATH = _flag_value("--qdrant-path", None)
+
+# Blue/green rebuild: fill a new `learning_vectors_v{N}` collection while
+# queries keep using the current one, then swap the alias over to it. Once
+# the alias exists, --force-recreate rebuilds this way too.
+BLUE_GREEN = "--blue-green" in sys.argv
+KEEP_VERSIONS = int(_flag_value("--keep-versions", "1"))
+if BLUE_GREEN and (RESUME or INCREMENTAL):
+    raise SystemExit("--blue-green always builds a fresh collection; drop --resume / --incremental.")
+
+# Name queries use (a collection, or an alias after the first blue/green
+# rebuild). main() points COLLECTION_NAME, the collection written to, at
+# the alias target or at the new version being built.
+ALIAS_NAME = "learning_vectors"
+COLLECTION_NAME = ALIAS_NAME
+
+# Embedding quota. Defaults match the Gemini free tier for gemini-embedding-001;
+# raise them (flags or EMBED_RPM / EMBED_TPM env vars) on paid projects.
+BATCH_SIZE = int(_flag_value("--batch-size", os.getenv("EMBED_BATCH_SIZE", "20")))
+REQUESTS_PER_MINUTE = float(_flag_value("--rpm", os.getenv("EMBED_RPM", "100")))
+TOKENS_PER_MINUTE = float(_flag_value("--tpm", os.getenv("EMBED_TPM", "30000")))
+
+# On-disk embedding cache: unchanged chunks are never sent to the API twice.
+USE_CACHE = "--no-cache" not in sys.argv
+CACHE_PATH = Path(_flag_value("--cache-path", Path(__file__).parent / ".cache" / "embeddings.sqlite"))
+CACHE_MAX_MB = int(_flag_value("--cache-max-mb", "1024"))
+JOURNAL_PATH = Path(_flag_value("--journal-path", Path(__file__).parent / ".cache" / "index_journal.jsonl"))
+
+# Async pipeline: load/split/embed/upsert stages overlap, connected by bounded queues.
+ASYNC_PIPELINE = "--async" in sys.argv
+EMBED_CONCURRENCY = int(_flag_value("--embed-concurrency", "4"))
+UPSERT_CONCURRENCY = int(_flag_value("--upsert-concurrency", "2"))
+QUEUE_SIZE = int(_flag_value("--queue-size", "8"))
+
+# Stream pages through the splitter instead of concatenating the whole PDF
+# first; peak memory stays flat regardless of document size.
+STREAM = "--stream" in sys.argv
+
+# Cache extracted page text (zstd-compressed, keyed by file hash + parser
+# version) so dry runs and re-indexing skip PDF parsing for unchanged files.
+USE_EXTRACT_CACHE = "--no-extract-cache" not in sys.argv
+CLEAR_EXTRACT_CACHE = "--clear-extract-cache" in sys.argv
+EXTRACT_CACHE_PATH = Path(_flag_value("--extract-cache-path", Path(__file__).parent / ".cache" / "extracted.sqlite"))
+EXTRACT_CACHE_MAX_MB = int(_flag_value("--extract-cache-max-mb", "512"))
+
+# Keep real page numbers: pages are still concatenated before splitting (same
+# chunks, same request count), but chunk offsets are mapped back to pages.
+PAGE_AWARE = "--no-page-map" not in sys.argv
+
+# Extract PDF text with N worker processes (0 = serial PyPDFLoader).
+EXTRACT_WORKERS = int(_flag_value("--extract-workers", "0"))
+
+# Chunker: "chars" (offset-based, same chunks as RecursiveCharacterTextSplitter),
+# "langchain" (RecursiveCharacterTextSplitter itself) or "tokens" (exact tiktoken budget).
+CHUNKER = _flag_value("--chunker", "chars")
+CHUNK_SIZE = 3000
+CHUNK_OVERLAP = 200
+CHUNK_TOKENS = int(_flag_value("--chunk-tokens", "750"))
+OVERLAP_TOKENS = int(_flag_value("--overlap-tokens", "50"))
+
+# Drop near-duplicate chunks (MinHash + LSH) before they are embedded.
+DEDUP = "--dedup" in sys.argv
+DEDUP_THRESHOLD = float(_flag_value("--dedup-threshold", str(DEFAULT_THRESHOLD)))
+
+# Vector quantization for the collection ("int8" or "binary" keep a compressed
+# copy in RAM and the float32 originals on disk; "none" undoes it).
+QUANTIZATION = _flag_value("--quantization", None)
+if QUANTIZATION is not None and QUANTIZATION not in QUANTIZATION_MODES:
+    raise SystemExit(f"--quantization must be one of: {', '.join(QUANTIZATION_MODES)}")
 
-if not pdf_path.exists():
-    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+# Reduced embedding size (Matryoshka), e.g. 256 or 768; 0 = full 3072. Queries
+# must use the same value (EMBED_DIMENSIONS for chat.py and the RQ worker).
+EMBED_DIMENSIONS = int(_flag_value("--dimensions", os.getenv("EMBED_DIMENSIONS", "0")) or 0) or None
 
-# Load PDF file as a single document to keep the embedding request count manageable.
-loader=PyPDFLoader(str(pdf_path), mode="single")
-documents=loader.load()   #read the PDF file and load its content into documents
-# print(f"Loaded {len(documents)} documents from the PDF.")
-# print("Docs[0]",documents[5])
+# Hybrid retrieval: store local BM25 sparse vectors next to the dense ones
+# (no extra API calls). Needs a fresh collection (--force-recreate or
+# --blue-green); runs into an existing hybrid collection keep it hybrid, and
+# so do rebuilds of one unless --dense-only drops the sparse vectors.
+HYBRID = "--hybrid" in sys.argv
+DENSE_ONLY = "--dense-only" in sys.argv
+
+# Corpus mode: index every PDF under a directory or matching a glob instead
+# of nodejs.pdf. Files unchanged since they were last indexed are skipped.
+INPUT = _flag_value("--input", None)
+MANIFEST_PATH = Path(_flag_value("--manifest-path", Path(__file__).parent / ".cache" / "index_manifest.sqlite"))
+
+pdf_path=Path(__file__).parent / "nodejs.pdf"
 
 # Chunking
-text_splitter=RecursiveCharacterTextSplitter(chunk_size=3000,chunk_overlap=200)
-# texts=text_splitter.split_documents(documents)
+if CHUNKER == "tokens":
+    text_splitter = TokenBudgetSplitter(chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS)
+    # Rough character size of a chunk, used to size the streaming window.
+    chunk_chars = CHUNK_TOKENS * CHARS_PER_TOKEN
+elif CHUNKER == "langchain":
+    text_splitter=RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE,chunk_overlap=CHUNK_OVERLAP)
+    chunk_chars = CHUNK_SIZE
+else:
+    text_splitter = FastRecursiveSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    chunk_chars = CHUNK_SIZE
+
+
+_extraction_cache = None
+
+
+def extraction_cache():
+    """The shared ExtractionCache, opened on first use (None with --no-extract-cache)."""
+    global _extraction_cache
+    if _extraction_cache is None and USE_EXTRACT_CACHE:
+        _extraction_cache = ExtractionCache(EXTRACT_CACHE_PATH, max_bytes=EXTRACT_CACHE_MAX_MB * 1024 * 1024)
+        if CLEAR_EXTRACT_CACHE:
+            _extraction_cache.clear()
+    return _extraction_cache
+
+
+def extract_pages():
+    """Parse the PDF into one document per page (in worker processes with --extract-workers)."""
+    if EXTRACT_WORKERS > 1:
+        return extract_pages_parallel(pdf_path, workers=EXTRACT_WORKERS)
+    return PyPDFLoader(str(pdf_path), mode="page").lazy_load()
+
+
+def load_documents():
+    """Lazily yield the documents handed to the splitter."""
+    by_page = STREAM or PAGE_AWARE
+    cache = extraction_cache()
+    if cache is None and not by_page and EXTRACT_WORKERS <= 1:
+        # Load PDF file as a single document to keep the embedding request count manageable.
+        return PyPDFLoader(str(pdf_path), mode="single").lazy_load()
+    # One document per page, extracted on demand (or read back from the
+    # extraction cache); the splitter stage concatenates them and keeps
+    # track of where each page starts.
+    if cache is not None:
+        extractor = PARALLEL_EXTRACTOR if EXTRACT_WORKERS > 1 else DEFAULT_EXTRACTOR
+        pages = cache.pages(pdf_path, extract_pages, extractor)
+    else:
+        pages = extract_pages()
+    return pages if by_page else iter([join_pages(pages)])
+
+
+def split_stage():
+    """Return `(split, flush)`: chunks per loaded document, and chunks left at the end."""
+    if STREAM or PAGE_AWARE:
+        # Without --stream the whole document is split at flush(), exactly like
+        # "single" mode, but chunks carry the pages they span.
+        streaming_splitter = StreamingSplitter(text_splitter, chunk_size=chunk_chars, window_chunks=4 if STREAM else None)
+        return streaming_splitter.feed, streaming_splitter.flush
+    return (lambda document: text_splitter.split_documents([document])), (lambda: [])
+
+
+def iter_chunks():
+    """Lazily yield every chunk of the PDF in document order."""
+    split, flush = split_stage()
+    for document in load_documents():
+        yield from split(document)
+    yield from flush()
+
 
-split_docs=text_splitter.split_documents(documents)
-# print(f"Split into {len(split_docs)} chunks.")
+def configure_collection(qdrant_client, changed=True):
+    """Record the embedding dimension, index filterable payload fields and apply --quantization.
 
-print(f"Prepared {len(split_docs)} chunks from {pdf_path.name}.")
+    `changed` (points were added or deleted) gives the collection a new index
+    version, which retires the answers cached against the old contents.
+    """
+    if not qdrant_client.collection_exists(COLLECTION_NAME):
+        return
+    record_dimensions(qdrant_client, COLLECTION_NAME, EMBED_DIMENSIONS)
+    if changed:
+        version = bump_index_version(qdrant_client, COLLECTION_NAME)
+        if not BLUE_GREEN:
+            # A blue/green build invalidates once its collection is live (promote_collection).
+            invalidate_answers(qdrant_client, keep_version=version)
+    ensure_payload_indexes(qdrant_client, COLLECTION_NAME)
+    if QUANTIZATION is not None:
+        apply_quantization(qdrant_client, COLLECTION_NAME, QUANTIZATION)
+        print(f"Collection {COLLECTION_NAME} quantization set to {QUANTIZATION}.")
 
-if not RUN_INDEXING:
-    print("Dry run complete. No embeddings were generated and no data was written to Qdrant.")
-    print("To perform indexing, run: python indexing.py --run")
-    print("To recreate the collection, run: python indexing.py --run --force-recreate")
-    raise SystemExit(0)
 
-# Vector Embeddings
-embeddings_model=GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+def open_vectorstore(qdrant_client, embeddings_model):
+    """Vector store writing to COLLECTION_NAME through the shared client, (re)creating the collection first."""
+    if FORCE_RECREATE and qdrant_client.collection_exists(COLLECTION_NAME):
+        qdrant_client.delete_collection(COLLECTION_NAME)
+    if not qdrant_client.collection_exists(COLLECTION_NAME):
+        qdrant_client.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=models.VectorParams(size=EMBED_DIMENSIONS or FULL_DIMENSIONS, distance=models.Distance.COSINE),
+            sparse_vectors_config=sparse_vectors_config() if HYBRID else None,
+        )
+    # Hybrid collections get their BM25 vectors from add_documents too.
+    return make_vector_store(qdrant_client, COLLECTION_NAME, embeddings_model)
 
-# Process in batches of 10 to stay safely under the Gemini RPM limit.
-batch_size = 10
-sleep_seconds = 60
 
-# using [embeddings_model] create embeddigs of [split_docs] and store in 
-# Some famous Vector DBs-> Pinecone(Cloud,Paid),Astra DB,ChromaDB(OpenSource),Milvus DB(OpenSource),PG Vector(OpenSource),Weaviate(OpenSource),Qdrant DB(OpenSource)
-# QDrant DB(OpenSource) - Lightweight,Spin up time is easy,out of the box :UI,Namespaces
+def promote_collection(qdrant_client):
+    """Blue/green: warm the freshly built version, repoint the alias at it and drop old versions."""
+    warm_seconds = warm_collection(qdrant_client, COLLECTION_NAME)
+    previous = swap_alias(qdrant_client, ALIAS_NAME, COLLECTION_NAME)
+    print(f"Alias {ALIAS_NAME} now points to {COLLECTION_NAME} (was {previous or 'unset'}; warmed in {warm_seconds:.1f}s).")
+    invalidate_answers(qdrant_client, keep_version=index_version(qdrant_client, COLLECTION_NAME))
+    removed = garbage_collect(qdrant_client, ALIAS_NAME, keep=KEEP_VERSIONS)
+    if removed:
+        print(f"Deleted old collection versions: {', '.join(removed)}")
 
-vectorstore = None
 
-try:
-    for start_index in range(0, len(split_docs), batch_size):
-        batch = split_docs[start_index : start_index + batch_size]
-        end_index = start_index + len(batch)
-        print(f"Processing batch {start_index} to {end_index}...")
+def index_corpus(files, manifest, embeddings_model, limiter, qdrant_client):
+    """Index many PDFs: a process pool chunks files, one shared pipeline embeds and upserts.
 
-        if vectorstore is None:
-            vectorstore = QdrantVectorStore.from_documents(
-                batch,
+    Returns whether any file was (re)indexed.
+    """
+    collection_exists = qdrant_client.collection_exists(COLLECTION_NAME) and not FORCE_RECREATE
+    todo = []
+    for path in files:
+        changed, state = manifest.check(path)
+        if changed:
+            todo.append((path, state))
+    print(f"Found {len(files)} PDFs under {INPUT}: {len(todo)} new or changed, {len(files) - len(todo)} unchanged (skipped).")
+    if not todo:
+        return False
+
+    states = dict(todo)
+    progress = CorpusProgress(total_files=len(todo))
+    near_duplicates = NearDuplicateFilter(DEDUP_THRESHOLD) if DEDUP else None
+
+    def chunks():
+        """Chunks to embed, file by file as the process pool finishes them."""
+        workers = EXTRACT_WORKERS or os.cpu_count() or 1
+        for path, file_chunks in chunk_files_parallel(states, text_splitter, workers=workers, cache=extraction_cache()):
+            source = str(path)
+            # Changed files are diffed against their stored points, as with --incremental.
+            sync = IncrementalSync(existing_point_ids(qdrant_client, COLLECTION_NAME, source) if collection_exists else set())
+            pending = [
+                chunk
+                for chunk in file_chunks
+                if not (near_duplicates is not None and near_duplicates.is_duplicate(chunk)) and sync.needs_upsert(chunk)
+            ]
+
+            def on_done(path=path, sync=sync, total=len(file_chunks)):
+                stale_ids = sync.stale_ids()
+                if stale_ids:
+                    delete_points(qdrant_client, COLLECTION_NAME, stale_ids)
+                    invalidate_chunks(qdrant_client, stale_ids)
+                manifest.mark_indexed(path, states[path], chunks=total)
+                print(
+                    f"{progress.prefix()} {path.name}: {sync.changed} chunks embedded, "
+                    f"{sync.unchanged} unchanged, {len(stale_ids)} stale deleted"
+                )
+
+            progress.expect(source, len(pending), on_done)
+            yield from pending
+
+    pipeline = IngestionPipeline(
+        embeddings_model,
+        get_async_client(QDRANT_URL, QDRANT_PATH),
+        COLLECTION_NAME,
+        limiter,
+        id_for=document_point_id,
+        config=PipelineConfig(
+            batch_size=BATCH_SIZE,
+            embed_concurrency=EMBED_CONCURRENCY,
+            upsert_concurrency=UPSERT_CONCURRENCY,
+            queue_size=QUEUE_SIZE,
+        ),
+        force_recreate=FORCE_RECREATE,
+        on_batch_done=progress.batch_done,
+        sparse_embeddings=BM25SparseEmbeddings() if HYBRID else None,
+    )
+    # Chunks arrive pre-split from the worker processes.
+    asyncio.run(pipeline.run(chunks(), lambda chunk: [chunk]))
+    print(pipeline.stats.summary())
+    if near_duplicates is not None:
+        print(near_duplicates.summary(BATCH_SIZE))
+    return True
+
+
+def main():
+    if INPUT:
+        files = discover_files(INPUT)
+        if not files:
+            raise FileNotFoundError(f"No PDF files found for --input {INPUT}")
+    elif not pdf_path.exists():
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    if not RUN_INDEXING and INPUT:
+        print(f"Found {len(files)} PDFs under {INPUT}.")
+        print("Dry run complete. No embeddings were generated and no data was written to Qdrant.")
+        print(f"To index them, run: python indexing.py --run --input {INPUT} [--extract-workers N]")
+        return
+
+    if not RUN_INDEXING:
+        chunk_count = sum(1 for _ in iter_chunks())
+        print(f"Prepared {chunk_count} chunks from {pdf_path.name}.")
+        if extraction_cache() is not None:
+            print(extraction_cache().summary())
+        print("Dry run complete. No embeddings were generated and no data was written to Qdrant.")
+        print("To perform indexing, run: python indexing.py --run")
+        print("To recreate the collection, run: python indexing.py --run --force-recreate")
+        print("To rebuild without query downtime (new version + alias swap), run: python indexing.py --run --blue-green [--keep-versions N]")
+        print("To only apply changes since the last run, run: python indexing.py --run --incremental")
+        print("To continue an interrupted run, run: python indexing.py --run --resume")
+        print("Tune the embedding quota with: --batch-size N --rpm N --tpm N")
+        print("Embedding cache options: --no-cache, --cache-path PATH, --cache-max-mb N")
+        print("To overlap embedding and upload, add: --async [--embed-concurrency N --upsert-concurrency N --queue-size N]")
+        print("To stream pages instead of loading the whole PDF into memory, add: --stream")
+        print("To extract PDF text with several processes, add: --extract-workers N")
+        print("To chunk by tokens instead of characters, add: --chunker tokens [--chunk-tokens N --overlap-tokens N]")
+        print("To skip near-duplicate chunks, add: --dedup [--dedup-threshold 0.9]")
+        print("To index a directory or glob of PDFs instead, add: --input DIR_OR_GLOB [--extract-workers N]")
+        print("Chunks carry their page range; to keep the old single-document metadata, add: --no-page-map")
+        print("Extraction cache options: --no-extract-cache, --clear-extract-cache, --extract-cache-path PATH, --extract-cache-max-mb N")
+        print("To quantize stored vectors (originals kept on disk), add: --quantization int8|binary|none")
+        print("To use the embedded local Qdrant instead of a server, add: --qdrant-path DIR (or set QDRANT_PATH)")
+        print("To bring up a node from an exported index instead of embedding, run: python snapshot.py import DIR")
+        print("To add local BM25 sparse vectors for hybrid (dense + keyword) search, add: --hybrid --blue-green")
+        print("To rebuild a hybrid collection without them, add: --dense-only")
+        print("To store reduced-dimension embeddings, add: --dimensions 256|768|1536 (set EMBED_DIMENSIONS for queries)")
+        return
+
+    if not os.getenv("GOOGLE_API_KEY"):
+        os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google API key: ")
+
+    # Vector Embeddings
+    embeddings_model=make_embeddings(EMBED_DIMENSIONS)
+
+    embedding_cache = None
+    if USE_CACHE:
+        embedding_cache = EmbeddingCache(CACHE_PATH, max_bytes=CACHE_MAX_MB * 1024 * 1024)
+        embeddings_model = CachedEmbeddings(embeddings_model, embedding_cache)
+
+    # Batches go out as fast as the requests/tokens-per-minute quota allows and only
+    # back off when a bucket runs dry or the API answers RESOURCE_EXHAUSTED / 429.
+    limiter = QuotaRateLimiter(
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+    )
+
+    # using [embeddings_model] create embeddigs of [split_docs] and store in 
+    # Some famous Vector DBs-> Pinecone(Cloud,Paid),Astra DB,ChromaDB(OpenSource),Milvus DB(OpenSource),PG Vector(OpenSource),Weaviate(OpenSource),Qdrant DB(OpenSource)
+    # QDrant DB(OpenSource) - Lightweight,Spin up time is easy,out of the box :UI,Namespaces
+
+    # Point IDs are derived from (source, chunk hash), so re-runs upsert in place
+    # instead of appending duplicates and incremental runs can diff against Qdrant.
+    vectorstore = None
+    sync = None
+
+    qdrant_client = get_client(QDRANT_URL, QDRANT_PATH)
+    print(f"Vector store: {describe(QDRANT_URL, QDRANT_PATH)}.")
+    global BLUE_GREEN, COLLECTION_NAME, HYBRID
+    if HYBRID and DENSE_ONLY:
+        raise SystemExit("--hybrid and --dense-only cannot be combined.")
+    live_collection = alias_target(qdrant_client, ALIAS_NAME)
+    live_name = live_collection or ALIAS_NAME
+    rebuilding = FORCE_RECREATE or BLUE_GREEN
+    live_hybrid = qdrant_client.collection_exists(live_name) and has_sparse_vectors(qdrant_client, live_name)
+    if rebuilding and not HYBRID and live_hybrid:
+        # A rebuild keeps hybrid search unless dense-only is asked for explicitly;
+        # chat.py and the worker would otherwise silently lose BM25 fusion.
+        if DENSE_ONLY:
+            print(f"Rebuilding without BM25 sparse vectors: queries on {ALIAS_NAME} will use dense search only.")
+        else:
+            HYBRID = True
+            print(f"{live_name} stores BM25 sparse vectors; the rebuild keeps them (add --dense-only to drop them).")
+    if FORCE_RECREATE and live_collection is not None:
+        # Dropping the collection behind the alias would drop the alias with it.
+        BLUE_GREEN = True
+    if BLUE_GREEN:
+        COLLECTION_NAME = next_version(qdrant_client, ALIAS_NAME)
+        print(f"Blue/green rebuild into {COLLECTION_NAME}; {ALIAS_NAME} keeps serving queries meanwhile.")
+    else:
+        # Other writes go to the collection behind the alias.
+        COLLECTION_NAME = live_collection or ALIAS_NAME
+    if not FORCE_RECREATE and qdrant_client.collection_exists(COLLECTION_NAME):
+        # Fail before spending any quota on vectors the collection can't hold.
+        try:
+            check_collection_dimensions(qdrant_client, COLLECTION_NAME, EMBED_DIMENSIONS)
+        except DimensionMismatchError as exc:
+            raise SystemExit(str(exc))
+        stored_hybrid = has_sparse_vectors(qdrant_client, COLLECTION_NAME)
+        if HYBRID and not stored_hybrid:
+            raise SystemExit(
+                f"Collection {COLLECTION_NAME} has no BM25 sparse vectors; rebuild it with --hybrid --blue-green "
+                "(or --force-recreate)."
+            )
+        # Chunks written into a hybrid collection need their sparse vectors too.
+        HYBRID = stored_hybrid
+
+    if INPUT:
+        # A blue/green build starts from an empty manifest of its own, which
+        # replaces the live one only once its collection has been promoted.
+        manifest_path = MANIFEST_PATH.with_suffix(f".{COLLECTION_NAME}.sqlite") if BLUE_GREEN else MANIFEST_PATH
+        manifest = FileManifest(manifest_path)
+        if FORCE_RECREATE or BLUE_GREEN:
+            # The collection is rebuilt from scratch, so nothing counts as indexed.
+            manifest.clear()
+        try:
+            changed = index_corpus(files, manifest, embeddings_model, limiter, qdrant_client)
+            configure_collection(qdrant_client, changed=changed)
+            if BLUE_GREEN:
+                promote_collection(qdrant_client)
+        except Exception as exc:
+            print("Indexing failed during embedding/upload.")
+            print(f"Details: {exc}")
+            traceback.print_exc()
+            print(limiter.stats.summary())
+            raise SystemExit(1)
+        finally:
+            manifest.close()
+        if BLUE_GREEN:
+            os.replace(manifest_path, MANIFEST_PATH)
+        print(limiter.stats.summary())
+        if embedding_cache:
+            print(embedding_cache.summary())
+        return
+    if INCREMENTAL and not FORCE_RECREATE and qdrant_client.collection_exists(COLLECTION_NAME):
+        sync = IncrementalSync(existing_point_ids(qdrant_client, COLLECTION_NAME, str(pdf_path)))
+        print(f"Incremental mode: {len(sync.existing_ids)} points already stored for {pdf_path.name}.")
+        vectorstore = make_vector_store(qdrant_client, COLLECTION_NAME, embeddings_model)
+
+    # Checkpoint journal: each batch confirmed in Qdrant is recorded so an
+    # interrupted run can be resumed at the cost of the in-flight batch only.
+    journal = IndexJournal(JOURNAL_PATH)
+    source = str(pdf_path)
+    resume_hashes = set()
+    if RESUME and journal.run_finished(source):
+        print(f"The last indexing run for {pdf_path.name} completed; nothing to resume.")
+        return
+    if RESUME:
+        journaled = journal.completed_hashes(source)
+        if journaled and qdrant_client.collection_exists(COLLECTION_NAME):
+            resume_hashes = confirmed_hashes(qdrant_client, COLLECTION_NAME, source, journaled)
+        ranges = ", ".join(f"{start}-{end}" for start, end in journal.completed_ranges(source))
+        print(f"Resuming: {len(resume_hashes)} chunks already confirmed in Qdrant will be skipped (journaled ranges: {ranges or 'none'}).")
+    if not resume_hashes:
+        journal.start_run(source)
+
+
+    near_duplicates = NearDuplicateFilter(DEDUP_THRESHOLD) if DEDUP else None
+
+    def _skip(doc):
+        """True for chunks that need no embedding in this run."""
+        # Near-duplicates are dropped before the incremental diff sees them,
+        # so copies stored by an earlier run without --dedup become stale.
+        if near_duplicates is not None and near_duplicates.is_duplicate(doc):
+            return True
+        # The incremental diff must see every remaining chunk, so it runs next.
+        if sync is not None and not sync.needs_upsert(doc):
+            return True
+        return text_hash(doc.page_content) in resume_hashes
+
+
+    def _record_batch(start, end, batch):
+        journal.record_batch(source, start, end, [text_hash(doc.page_content) for doc in batch])
+
+
+    def pending_chunks():
+        """Yield `(position, chunk)` for the chunks this run has to embed."""
+        for position, doc in enumerate(iter_chunks()):
+            if not _skip(doc):
+                yield position, doc
+
+
+    try:
+        if ASYNC_PIPELINE:
+            pipeline = IngestionPipeline(
                 embeddings_model,
-                collection_name="learning_vectors",
-                host="localhost",
-                port=6333,
+                get_async_client(QDRANT_URL, QDRANT_PATH),
+                COLLECTION_NAME,
+                limiter,
+                id_for=document_point_id,
+                config=PipelineConfig(
+                    batch_size=BATCH_SIZE,
+                    embed_concurrency=EMBED_CONCURRENCY,
+                    upsert_concurrency=UPSERT_CONCURRENCY,
+                    queue_size=QUEUE_SIZE,
+                ),
                 force_recreate=FORCE_RECREATE,
+                skip=_skip,
+                on_batch_done=_record_batch,
+                sparse_embeddings=BM25SparseEmbeddings() if HYBRID else None,
             )
+            split, flush = split_stage()
+            asyncio.run(pipeline.run(load_documents(), split, flush))
+            print(pipeline.stats.summary())
         else:
-            vectorstore.add_documents(batch)
+            for items in batched(pending_chunks(), BATCH_SIZE):
+                positions = [position for position, _ in items]
+                batch = [doc for _, doc in items]
+                batch_ids = [document_point_id(doc) for doc in batch]
+                texts = [doc.page_content for doc in batch]
+                # Only chunks missing from the cache count against the embedding quota.
+                uncached = embeddings_model.uncached(texts) if embedding_cache else texts
+                print(f"Processing chunks {positions[0]} to {positions[-1] + 1} ({len(batch) - len(uncached)} cached)...")
+
+                if vectorstore is None:
+                    vectorstore = open_vectorstore(qdrant_client, embeddings_model)
+                upload = lambda: vectorstore.add_documents(batch, ids=batch_ids)
+
+                if uncached:
+                    limiter.run(
+                        upload,
+                        requests=len(uncached),
+                        tokens=sum(estimate_tokens(text) for text in uncached),
+                    )
+                else:
+                    # Every vector is cached: no API call, straight to the Qdrant upsert.
+                    upload()
 
-        if end_index < len(split_docs):
-            print(f"Sleeping for {sleep_seconds} seconds to respect rate limits...")
-            time.sleep(sleep_seconds)
-except Exception as exc:
-    print("Indexing failed during embedding/upload.")
-    print("If you see RESOURCE_EXHAUSTED, switch to another API key/project or wait for quota reset.")
-    print(f"Details: {exc}")
-    traceback.print_exc()
-    raise SystemExit(1)
+                _record_batch(positions[0], positions[-1] + 1, batch)
 
-print("Vector store created and documents embedded successfully.")
-print("You can now query the vector store for relevant information.")
+        # Delete points for chunks the document no longer produces only after the
+        # replacements are in, so queries never see a gap.
+        changed = True
+        if sync is not None:
+            stale_ids = sync.stale_ids()
+            if stale_ids:
+                print(f"Deleting {len(stale_ids)} stale points...")
+                delete_points(qdrant_client, COLLECTION_NAME, stale_ids)
+                # Answers quoting the deleted chunks must not be served again.
+                invalidate_chunks(qdrant_client, stale_ids)
+            print(sync.summary())
+            changed = bool(sync.changed or stale_ids)
+        if near_duplicates is not None:
+            print(near_duplicates.summary(BATCH_SIZE))
+        configure_collection(qdrant_client, changed=changed)
+        if BLUE_GREEN:
+            promote_collection(qdrant_client)
+        journal.finish_run(source)
+    except Exception as exc:
+        print("Indexing failed during embedding/upload.")
+        print("If you see RESOURCE_EXHAUSTED, switch to another API key/project or wait for quota reset.")
+        print(f"Details: {exc}")
+        traceback.print_exc()
+        print(limiter.stats.summary())
+        if embedding_cache:
+            print(embedding_cache.summary())
+        raise SystemExit(1)
 
+    print("Vector store created and documents embedded successfully.")
+    print(limiter.stats.summary())
+    if embedding_cache:
+        print(embedding_cache.summary())
+    if extraction_cache() is not None:
+        print(extraction_cache().summary())
+    print("You can now query the vector store for relevant information.")
 
 
+# Everything runs under main() so --extract-workers can spawn worker processes
+# (which re-import this module) on Windows and macOS.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Checkpoint journal for resumable indexing.
+
+A multi-hour `indexing.py --run` that dies halfway (quota exhaustion, Ctrl-C,
+network blip) used to restart from chunk 0. The journal is an append-only
+JSON-lines file: after every batch is confirmed written to Qdrant we append
+the batch range and the hashes of its chunks, and fsync. `--resume` reads the
+records of the latest run for the source, double-checks the corresponding
+points really exist in Qdrant, and skips them, so a crash costs at most the
+batch that was in flight.
+
+Record shapes (one JSON object per line):
+
+    {"event": "start",  "source": ..., "time": ...}
+    {"event": "batch",  "source": ..., "start": 0, "end": 20, "hashes": [...], "time": ...}
+    {"event": "finish", "source": ..., "time": ...}
+
+A `start` record begins a new run and supersedes earlier batches for the
+same source.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+
+from incremental import point_id_for_hash
+
+# Number of IDs per `retrieve` call when confirming points on resume.
+_RETRIEVE_BATCH = 1000
+
+
+class IndexJournal:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _append(self, record: dict) -> None:
+        record["time"] = time.time()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(line)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def start_run(self, source: str) -> None:
+        self._append({"event": "start", "source": source})
+
+    def record_batch(self, source: str, start: int, end: int, hashes: list[str]) -> None:
+        """Record chunks [start, end) of `source` as durably written to Qdrant."""
+        self._append({"event": "batch", "source": source, "start": start, "end": end, "hashes": hashes})
+
+    def finish_run(self, source: str) -> None:
+        self._append({"event": "finish", "source": source})
+
+    def _latest_run(self, source: str) -> list[dict]:
+        records: list[dict] = []
+        if not self.path.exists():
+            return records
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; everything
+                    # before it was fsynced and is still valid.
+                    continue
+                if record.get("source") != source:
+                    continue
+                if record["event"] == "start":
+                    records = []
+                records.append(record)
+        return records
+
+    def completed_hashes(self, source: str) -> set[str]:
+        """Chunk hashes recorded for the latest run of `source`."""
+        hashes: set[str] = set()
+        for record in self._latest_run(source):
+            if record["event"] == "batch":
+                hashes.update(record["hashes"])
+        return hashes
+
+    def run_finished(self, source: str) -> bool:
+        """True when the latest run of `source` completed (nothing to resume)."""
+        records = self._latest_run(source)
+        return bool(records) and records[-1]["event"] == "finish"
+
+    def completed_ranges(self, source: str) -> list[tuple[int, int]]:
+        """Merged `[start, end)` chunk ranges recorded for the latest run."""
+        ranges = sorted(
+            (record["start"], record["end"]) for record in self._latest_run(source) if record["event"] == "batch"
+        )
+        merged: list[tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+
+def confirmed_hashes(client: QdrantClient, collection_name: str, source: str, hashes: set[str]) -> set[str]:
+    """Subset of journaled `hashes` whose points actually exist in the collection.
+
+    Guards against a journal that outlived its collection (e.g. the
+    collection was dropped by hand after the crash).
+    """
+    by_id = {point_id_for_hash(source, chunk_hash): chunk_hash for chunk_hash in hashes}
+    ids = list(by_id)
+    confirmed: set[str] = set()
+    for start in range(0, len(ids), _RETRIEVE_BATCH):
+        points = client.retrieve(
+            collection_name=collection_name,
+            ids=ids[start : start + _RETRIEVE_BATCH],
+            with_payload=False,
+            with_vectors=False,
+        )
+        confirmed.update(by_id[str(point.id)] for point in points)
+    return confirmed
@@ -0,0 +1,111 @@
+"""
+Reduced-dimension (Matryoshka) embeddings.
+
+gemini-embedding-001 is trained so that a prefix of its 3072-d vector is
+itself a usable embedding, and the API can return that prefix directly via
+`output_dimensionality` (e.g. 256 or 768). Smaller vectors shrink storage
+and make every distance computation proportionally cheaper.
+
+The dimension has to be the same at index and query time, so it is read
+from one place: `--dimensions N` for indexing.py, `EMBED_DIMENSIONS` for
+every script. `make_embeddings` builds the embeddings object for it:
+
+- reduced vectors are truncated (in case the API returns more) and
+  re-normalized to unit length, since only the full 3072-d output comes
+  back normalized;
+- `check_collection_dimensions` compares the configured dimension with the
+  collection's vector size before anything is embedded or searched, so a
+  mismatch fails with a clear message instead of a Qdrant error mid-run;
+- `record_dimensions` stores model and dimension in the collection
+  metadata, next to the vector size Qdrant already enforces.
+"""
+
+import math
+import os
+
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from qdrant_client import QdrantClient
+
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+FULL_DIMENSIONS = 3072
+
+
+class DimensionMismatchError(ValueError):
+    pass
+
+
+def embedding_dimensions() -> int | None:
+    """Configured output dimensionality (`EMBED_DIMENSIONS`), None for the full size."""
+    value = int(os.getenv("EMBED_DIMENSIONS", "0") or 0)
+    return value if value and value != FULL_DIMENSIONS else None
+
+
+def l2_normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+class MatryoshkaEmbeddings(Embeddings):
+    """Truncate and re-normalize the vectors of a wrapped embeddings model."""
+
+    def __init__(self, embeddings: Embeddings, dimensions: int):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+        # Read by CachedEmbeddings to key cached vectors per model and size.
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.task_type = getattr(embeddings, "task_type", None)
+        self.output_dimensionality = dimensions
+
+    def _reduce(self, vector: list[float]) -> list[float]:
+        return l2_normalize(vector[: self.dimensions])
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._reduce(vector) for vector in self.embeddings.embed_documents(texts)]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._reduce(vector) for vector in await self.embeddings.aembed_documents(texts)]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._reduce(self.embeddings.embed_query(text))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self._reduce(await self.embeddings.aembed_query(text))
+
+
+def make_embeddings(dimensions: int | None = None) -> Embeddings:
+    """gemini-embedding-001 at `dimensions` (None: full size, as returned by the API)."""
+    if dimensions is None:
+        return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    if not 0 < dimensions <= FULL_DIMENSIONS:
+        raise ValueError(f"dimensions must be between 1 and {FULL_DIMENSIONS}, got {dimensions}")
+    return MatryoshkaEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, output_dimensionality=dimensions), dimensions
+    )
+
+
+def collection_dimensions(client: QdrantClient, collection_name: str) -> int:
+    """Vector size of the collection's (unnamed) dense vector."""
+    vectors = client.get_collection(collection_name).config.params.vectors
+    if isinstance(vectors, dict):
+        vectors = vectors[""]
+    return vectors.size
+
+
+def check_collection_dimensions(client: QdrantClient, collection_name: str, dimensions: int | None) -> None:
+    """Raise `DimensionMismatchError` if the collection was built for another size."""
+    expected = dimensions or FULL_DIMENSIONS
+    stored = collection_dimensions(client, collection_name)
+    if stored != expected:
+        raise DimensionMismatchError(
+            f"Collection {collection_name} stores {stored}-d vectors but embeddings are configured for "
+            f"{expected}-d. Set EMBED_DIMENSIONS={stored} (or --dimensions {stored}), or rebuild the "
+            f"collection with --force-recreate."
+        )
+
+
+def record_dimensions(client: QdrantClient, collection_name: str, dimensions: int | None) -> None:
+    client.update_collection(
+        collection_name=collection_name,
+        metadata={"embedding_model": EMBEDDING_MODEL, "embedding_dimensions": dimensions or FULL_DIMENSIONS},
+    )
@@ -0,0 +1,87 @@
+"""
+Process-pool parallel PDF text extraction.
+
+pypdf text extraction is pure Python and CPU-bound, so on large manuals it
+dominates the non-network time of `indexing.py`. `extract_pages_parallel`
+shards the page range across a `ProcessPoolExecutor`; every worker opens the
+PDF on its own (only the path crosses the process boundary) and returns the
+text of its shard. Shards are yielded back strictly in page order and only a
+bounded number are in flight, so the result can feed the streaming splitter
+without buffering the whole document.
+
+Page documents carry the same metadata as `PyPDFLoader(mode="page")`: the
+PDF info fields (`producer`, `creator`, `creationdate`, ...) normalized by
+PyPDFParser's own helper, `source`, `total_pages`, `page` and `page_label`.
+The page text is extracted the same way, so the two are interchangeable.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from langchain_community.document_loaders.parsers.pdf import _purge_metadata
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+from streaming import PAGES_DELIMITER
+
+DEFAULT_SHARD_SIZE = 8
+# Extractor name in the extraction cache key.
+EXTRACTOR = "parallel_extract"
+
+
+def _extract_shard(path: str, start: int, end: int) -> list[tuple[int, str, str]]:
+    """Worker: extract pages [start, end) as (page number, page label, text)."""
+    reader = PdfReader(path)
+    return [
+        (number, reader.page_labels[number], reader.pages[number].extract_text(extraction_mode="plain").strip())
+        for number in range(start, end)
+    ]
+
+
+def document_metadata(path: str) -> dict:
+    """Per-document metadata exactly as `PyPDFParser` builds it (defaults, info fields, source, page count)."""
+    reader = PdfReader(path)
+    return _purge_metadata(
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": path, "total_pages": len(reader.pages)}
+    )
+
+
+def extract_pages_parallel(
+    path: str | Path,
+    workers: int | None = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Iterator[Document]:
+    """Yield one `Document` per page, extracted by `workers` processes, in page order."""
+    path = str(path)
+    workers = workers or os.cpu_count() or 1
+    metadata = document_metadata(path)
+    total_pages = metadata["total_pages"]
+    shards = [(start, min(start + shard_size, total_pages)) for start in range(0, total_pages, shard_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight: deque = deque()
+        pending = iter(shards)
+        # Keep every worker busy plus one shard queued each, but no more, so
+        # a slow consumer doesn't make finished shards pile up in memory.
+        for start, end in pending:
+            in_flight.append(executor.submit(_extract_shard, path, start, end))
+            if len(in_flight) >= workers * 2:
+                break
+        while in_flight:
+            for number, label, text in in_flight.popleft().result():
+                yield Document(page_content=text, metadata=metadata | {"page": number, "page_label": label})
+            next_shard = next(pending, None)
+            if next_shard is not None:
+                in_flight.append(executor.submit(_extract_shard, path, *next_shard))
+
+
+def join_pages(pages: Iterable[Document]) -> Document:
+    """Concatenate page documents the way `PyPDFLoader(mode="single")` does."""
+    pages = list(pages)
+    metadata = {k: v for k, v in pages[0].metadata.items() if k not in ("page", "page_label")} if pages else {}
+    return Document(page_content=PAGES_DELIMITER.join(page.page_content for page in pages), metadata=metadata)
@@ -0,0 +1,281 @@
+"""
+Bounded-concurrency asyncio ingestion pipeline.
+
+The serial loop in `indexing.py` embeds a batch, uploads it, then embeds the
+next one, so embedding latency and Qdrant write latency never overlap. This
+module runs ingestion as four stages connected by bounded queues:
+
+    load -> split -> embed (N workers) -> upsert (M workers)
+
+- load:   pulls documents from a (lazy) iterable in a worker thread.
+- split:  turns each document into chunks and groups them into batches.
+- embed:  `aembed_documents` calls, sharing one `QuotaRateLimiter`.
+- upsert: writes points through `AsyncQdrantClient` (adding local BM25
+          sparse vectors when `sparse_embeddings` is given).
+
+The queues are small, so a slow stage applies backpressure to the ones before
+it and memory stays bounded. Each stage records how long its workers were
+busy; `PipelineStats.summary()` prints the utilization so the bottleneck is
+visible (the stage close to 100% is the one to scale).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from langchain_core.documents import Document
+from qdrant_client import AsyncQdrantClient, models
+
+from filters import PAYLOAD_INDEXES
+from hybrid import SPARSE_VECTOR_NAME, sparse_vectors_config
+from rate_limiter import QuotaRateLimiter, estimate_tokens
+
+# Sentinel pushed through a queue once per consumer to stop it.
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    items: int = 0
+    busy_seconds: float = 0.0
+
+    def utilization(self, wall_seconds: float) -> float:
+        if wall_seconds <= 0 or self.workers == 0:
+            return 0.0
+        return self.busy_seconds / (wall_seconds * self.workers)
+
+
+@dataclass
+class PipelineStats:
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+    finished: float | None = None
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> str:
+        wall = self.wall_seconds
+        lines = [f"Pipeline finished in {wall:.1f}s. Stage utilization:"]
+        for stage in self.stages.values():
+            lines.append(
+                f"  {stage.name:<7} workers={stage.workers:<3} items={stage.items:<6} "
+                f"busy={stage.busy_seconds:8.1f}s utilization={stage.utilization(wall):6.1%}"
+            )
+        return "\n".join(lines)
+
+
+@dataclass
+class PipelineConfig:
+    batch_size: int = 20
+    embed_concurrency: int = 4
+    upsert_concurrency: int = 2
+    # Maximum number of items waiting between two stages.
+    queue_size: int = 8
+
+
+class IngestionPipeline:
+    """Embed and upsert documents with overlapping, bounded stages."""
+
+    def __init__(
+        self,
+        embeddings,
+        client: AsyncQdrantClient,
+        collection_name: str,
+        limiter: QuotaRateLimiter,
+        id_for: Callable[[Document], str],
+        config: PipelineConfig | None = None,
+        force_recreate: bool = False,
+        skip: Callable[[Document], bool] | None = None,
+        on_batch_done: Callable[[int, int, list[Document]], None] | None = None,
+        sparse_embeddings=None,
+    ):
+        self.embeddings = embeddings
+        self.client = client
+        self.collection_name = collection_name
+        self.limiter = limiter
+        self.id_for = id_for
+        self.config = config or PipelineConfig()
+        self.force_recreate = force_recreate
+        # `skip(chunk)` drops chunks before they are batched (used by --resume);
+        # `on_batch_done(start, end, batch)` fires (in a worker thread) once a
+        # batch is in Qdrant.
+        self.skip = skip
+        self.on_batch_done = on_batch_done
+        self.sparse_embeddings = sparse_embeddings
+        self.stats = PipelineStats()
+        self._collection_ready = False
+        self._collection_lock = asyncio.Lock()
+
+    def _stage(self, name: str, workers: int) -> StageStats:
+        stage = StageStats(name=name, workers=workers)
+        self.stats.stages[name] = stage
+        return stage
+
+    async def run(
+        self,
+        documents: Iterable[Document],
+        split: Callable[[Document], list[Document]],
+        flush: Callable[[], list[Document]] | None = None,
+    ) -> PipelineStats:
+        """Run all stages to completion and return their statistics.
+
+        `documents` may be a lazy iterator (e.g. `loader.lazy_load()`); it is
+        advanced in a worker thread so PDF parsing does not block the loop.
+        `split` maps one loaded document to its chunks (identity for
+        pre-split input); `flush`, if given, returns the chunks a stateful
+        splitter still holds after the last document.
+        """
+        config = self.config
+        loaded: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+        batches: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+        embedded: asyncio.Queue = asyncio.Queue(maxsize=config.queue_size)
+
+        load_stats = self._stage("load", 1)
+        split_stats = self._stage("split", 1)
+        embed_stats = self._stage("embed", config.embed_concurrency)
+        upsert_stats = self._stage("upsert", config.upsert_concurrency)
+
+        async def load() -> None:
+            iterator = iter(documents)
+            while True:
+                started = time.monotonic()
+                document = await asyncio.to_thread(next, iterator, _DONE)
+                load_stats.busy_seconds += time.monotonic() - started
+                if document is _DONE:
+                    break
+                load_stats.items += 1
+                await loaded.put(document)
+            await loaded.put(_DONE)
+
+        async def split_into_batches() -> None:
+            # Batches carry the position of their first chunk in the overall
+            # chunk sequence (skipped chunks included) for journaling.
+            batch: list[Document] = []
+            batch_start = position = 0
+
+            async def emit(chunks: list[Document]) -> None:
+                nonlocal batch, batch_start, position
+                split_stats.items += len(chunks)
+                for chunk in chunks:
+                    position += 1
+                    if self.skip is not None and self.skip(chunk):
+                        continue
+                    if not batch:
+                        batch_start = position - 1
+                    batch.append(chunk)
+                    if len(batch) == config.batch_size:
+                        await batches.put((batch_start, position, batch))
+                        batch = []
+
+            while (document := await loaded.get()) is not _DONE:
+                started = time.monotonic()
+                chunks = await asyncio.to_thread(split, document)
+                split_stats.busy_seconds += time.monotonic() - started
+                await emit(chunks)
+            if flush is not None:
+                await emit(flush())
+            if batch:
+                await batches.put((batch_start, position, batch))
+            for _ in range(config.embed_concurrency):
+                await batches.put(_DONE)
+
+        async def embed() -> None:
+            while (item := await batches.get()) is not _DONE:
+                start, end, batch = item
+                started = time.monotonic()
+                texts = [doc.page_content for doc in batch]
+                uncached = self.embeddings.uncached(texts) if hasattr(self.embeddings, "uncached") else texts
+                if uncached:
+                    vectors = await self.limiter.run_async(
+                        lambda: self.embeddings.aembed_documents(texts),
+                        requests=len(uncached),
+                        tokens=sum(estimate_tokens(text) for text in uncached),
+                    )
+                else:
+                    vectors = await self.embeddings.aembed_documents(texts)
+                embed_stats.busy_seconds += time.monotonic() - started
+                embed_stats.items += len(batch)
+                await embedded.put((start, end, batch, vectors))
+
+        async def upsert() -> None:
+            while (item := await embedded.get()) is not _DONE:
+                start, end, batch, vectors = item
+                started = time.monotonic()
+                await self._ensure_collection(len(vectors[0]))
+                if self.sparse_embeddings is not None:
+                    sparse = await asyncio.to_thread(
+                        self.sparse_embeddings.embed_documents, [doc.page_content for doc in batch]
+                    )
+                    vectors = [
+                        {"": vector, SPARSE_VECTOR_NAME: models.SparseVector(indices=s.indices, values=s.values)}
+                        for vector, s in zip(vectors, sparse)
+                    ]
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=[
+                        models.PointStruct(
+                            id=self.id_for(doc),
+                            vector=vector,
+                            payload={"page_content": doc.page_content, "metadata": doc.metadata},
+                        )
+                        for doc, vector in zip(batch, vectors)
+                    ],
+                    wait=True,
+                )
+                upsert_stats.busy_seconds += time.monotonic() - started
+                upsert_stats.items += len(batch)
+                if self.on_batch_done is not None:
+                    # Hooks may block (journal writes, Qdrant deletes of stale points).
+                    await asyncio.to_thread(self.on_batch_done, start, end, batch)
+
+        async def embed_then_stop_upserts(embed_tasks: list[asyncio.Task]) -> None:
+            # The upsert workers stop once every embed worker has drained.
+            await asyncio.gather(*embed_tasks)
+            for _ in range(config.upsert_concurrency):
+                await embedded.put(_DONE)
+
+        self.stats.started = time.monotonic()
+        embed_tasks = [asyncio.create_task(embed()) for _ in range(config.embed_concurrency)]
+        tasks = [
+            asyncio.create_task(load()),
+            asyncio.create_task(split_into_batches()),
+            *embed_tasks,
+            asyncio.create_task(embed_then_stop_upserts(embed_tasks)),
+            *(asyncio.create_task(upsert()) for _ in range(config.upsert_concurrency)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.stats.finished = time.monotonic()
+        return self.stats
+
+    async def _ensure_collection(self, dimensions: int) -> None:
+        """Create (or recreate) the collection once the vector size is known."""
+        if self._collection_ready:
+            return
+        async with self._collection_lock:
+            if self._collection_ready:
+                return
+            exists = await self.client.collection_exists(self.collection_name)
+            if exists and self.force_recreate:
+                await self.client.delete_collection(self.collection_name)
+                exists = False
+            if not exists:
+                await self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE),
+                    sparse_vectors_config=sparse_vectors_config() if self.sparse_embeddings is not None else None,
+                )
+                # Indexed before the first upsert, so HNSW is built filter-aware.
+                for field_name, schema in PAYLOAD_INDEXES.items():
+                    await self.client.create_payload_index(
+                        collection_name=self.collection_name, field_name=field_name, field_schema=schema
+                    )
+            self._collection_ready = True
@@ -0,0 +1,120 @@
+"""
+Where the vector store lives: a Qdrant server or the embedded local mode.
+
+By default every script talks to the Qdrant server at `QDRANT_URL`
+(http://localhost:6333), so each search and upsert crosses HTTP. Setting
+`QDRANT_PATH` switches chat.py, indexing.py, snapshot.py, the benchmarks and
+the RQ worker to qdrant_client's in-process local mode instead:
+
+- `QDRANT_PATH=/some/dir`: collections persisted on disk in that directory;
+- `QDRANT_PATH=:memory:`: nothing persisted (tests, benchmarks).
+
+Local mode skips the per-request HTTP/JSON round trip and needs no
+container, which suits small corpora on a single box. It searches exactly
+(brute force), ignores quantization and payload indexes, and a directory
+can only be opened by one process at a time: index first, then query, and
+run a single non-forking worker (`run_worker.py`) against it.
+
+Key behaviors:
+- `get_client()` returns one client per process and location; a local
+  directory is locked by its client, so everything in a process has to
+  share it. `reset_client()` replaces a broken one.
+- `get_async_client()` for the async ingestion pipeline: an
+  `AsyncQdrantClient` for a server, or `LocalAsyncClient` wrapping the
+  shared local client (a second local client on the same directory would
+  fail to get the lock, and `:memory:` would not see the same data).
+"""
+
+import asyncio
+import os
+import threading
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+DEFAULT_URL = "http://localhost:6333"
+
+_clients: dict[tuple, QdrantClient] = {}
+_clients_lock = threading.Lock()
+
+
+def qdrant_location(url: str | None = None, path: str | None = None) -> tuple[str | None, str | None]:
+    """`(url, path)` to connect to: explicit arguments first, then QDRANT_PATH / QDRANT_URL."""
+    if url or path:
+        return (None, path) if path else (url, None)
+    path = os.getenv("QDRANT_PATH") or None
+    return (None, path) if path else (os.getenv("QDRANT_URL") or DEFAULT_URL, None)
+
+
+def is_local(url: str | None = None, path: str | None = None) -> bool:
+    return qdrant_location(url, path)[1] is not None
+
+
+def describe(url: str | None = None, path: str | None = None) -> str:
+    url, path = qdrant_location(url, path)
+    return f"embedded Qdrant at {path}" if path else f"Qdrant at {url}"
+
+
+def get_client(url: str | None = None, path: str | None = None) -> QdrantClient:
+    """The process-wide client for the configured location."""
+    url, path = qdrant_location(url, path)
+    # Keyed by PID too: a client inherited across fork() must not be reused.
+    key = (os.getpid(), url, path)
+    with _clients_lock:
+        if key not in _clients:
+            if path == ":memory:":
+                _clients[key] = QdrantClient(location=":memory:")
+            elif path:
+                _clients[key] = QdrantClient(path=path)
+            else:
+                _clients[key] = QdrantClient(url=url)
+        return _clients[key]
+
+
+def reset_client(url: str | None = None, path: str | None = None) -> None:
+    """Close and forget this process's client, so the next `get_client()` reconnects."""
+    url, path = qdrant_location(url, path)
+    with _clients_lock:
+        client = _clients.pop((os.getpid(), url, path), None)
+    if client is not None:
+        try:
+            client.close()
+        except Exception:
+            # The connection is being replaced because it is already broken.
+            pass
+
+
+class LocalAsyncClient:
+    """Async facade over a shared local-mode `QdrantClient`.
+
+    Calls run in a worker thread, one at a time: the local mode is not
+    meant for concurrent writers, and the async pipeline only needs the
+    event loop to stay free while a call runs.
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.Lock()
+
+    def _locked(self, method, *args, **kwargs):
+        with self._lock:
+            return method(*args, **kwargs)
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(self._locked, method, *args, **kwargs)
+
+        return call
+
+    async def close(self) -> None:
+        # The wrapped client is shared with the rest of the process.
+        pass
+
+
+def get_async_client(url: str | None = None, path: str | None = None):
+    """An async client for the configured location (see `LocalAsyncClient`)."""
+    url, path = qdrant_location(url, path)
+    if path:
+        return LocalAsyncClient(get_client(path=path))
+    return AsyncQdrantClient(url=url)
@@ -0,0 +1,73 @@
+"""
+Quantized vector storage for the `learning_vectors` collection.
+
+Full float32 vectors cost 4 bytes per dimension in RAM, which caps how many
+chunks fit on a node. Qdrant can keep a compressed copy of every vector in
+RAM and move the originals to disk:
+
+- `int8`:   scalar quantization, 1 byte per dimension (4x smaller);
+- `binary`: 1 bit per dimension (32x smaller), best with high-dimensional
+            embeddings such as gemini-embedding-001's 3072.
+
+Searches then run on the in-RAM quantized vectors, fetch `oversampling`
+times more candidates than requested and rescore them with the on-disk
+originals, which recovers most of the recall lost to quantization.
+
+`apply_quantization` switches an existing collection (it is an in-place
+config update; Qdrant rebuilds the quantized copy in the background), and
+`search_params` is what `chat.py` and `task_queue/worker.py` pass to
+`similarity_search`. The oversampling factor comes from
+`QDRANT_OVERSAMPLING`; on collections without quantization the parameters
+are ignored by Qdrant.
+"""
+
+import os
+
+from qdrant_client import QdrantClient, models
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# Bytes of RAM per dimension for each mode (binary: one bit).
+BYTES_PER_DIMENSION = {"none": 4.0, "int8": 1.0, "binary": 1 / 8}
+
+DEFAULT_OVERSAMPLING = 2.0
+
+
+def quantization_config(mode: str, always_ram: bool = True):
+    """Qdrant quantization config for `mode` (`models.Disabled` for "none")."""
+    if mode == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=always_ram))
+    if mode == "none":
+        return models.Disabled.DISABLED
+    raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {', '.join(QUANTIZATION_MODES)}")
+
+
+def apply_quantization(client: QdrantClient, collection_name: str, mode: str) -> None:
+    """Quantize (or un-quantize) an existing collection in place.
+
+    With quantization on, the original vectors move to disk (`on_disk`) and
+    only the quantized copy stays in RAM; "none" moves them back.
+    """
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": models.VectorParamsDiff(on_disk=mode != "none")},
+        quantization_config=quantization_config(mode),
+    )
+
+
+def search_params(oversampling: float | None = None) -> models.SearchParams:
+    """Search on quantized vectors, oversample, then rescore with the originals."""
+    if oversampling is None:
+        oversampling = float(os.getenv("QDRANT_OVERSAMPLING", DEFAULT_OVERSAMPLING))
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(ignore=False, rescore=True, oversampling=oversampling)
+    )
+
+
+def ram_bytes(points: int, dimensions: int, mode: str) -> int:
+    """RAM held by the vectors Qdrant keeps resident for `mode` (excluding the HNSW graph)."""
+    return int(points * dimensions * BYTES_PER_DIMENSION[mode])
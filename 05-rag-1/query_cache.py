@@ -0,0 +1,242 @@
+"""
+Query-embedding cache for the retrieval path.
+
+Every chat.py run and every `process_query` job embedded its query with a
+network round trip to the embedding API, although most traffic is the same
+few FAQ-style questions. `CachedQueryEmbeddings` wraps the embeddings
+object and answers `embed_query` from `QueryEmbeddingCache`, keyed by
+
+    (model name, output dimensionality, hash of the normalized query)
+
+so a repeat question goes straight to the vector search. Normalization
+folds case, Unicode form, whitespace and trailing punctuation, so "What is
+npm?" and "what is npm" share an entry.
+
+Two tiers:
+- an in-process LRU with a TTL (`QUERY_CACHE_SIZE` entries, default 1024;
+  0 disables the cache; `QUERY_CACHE_TTL` seconds, default one day);
+- optionally Redis (the instance the RQ queue uses), shared by every
+  worker and surviving forks and restarts. Entries expire there after the
+  same TTL. Redis errors only count as misses.
+
+Key behaviors:
+- Hit / miss counts and the embedding latency saved are kept per process
+  (`stats()`, `summary()`) and, with Redis, summed across processes in one
+  hash (`shared_stats()`), which the API server exposes.
+- Saved latency is estimated from a moving average of the embedding calls
+  that missed (the Redis-wide average in a process that has not missed
+  yet), minus the time spent on the lookup itself.
+- Vectors are stored as packed float32.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+REDIS_PREFIX = "rag:query-embedding:"
+REDIS_STATS_KEY = REDIS_PREFIX + "stats"
+
+# Weight of the newest miss in the moving average of embedding latency.
+_LATENCY_SMOOTHING = 0.2
+_TRAILING_PUNCTUATION = "?!.。 "
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split()).rstrip(_TRAILING_PUNCTUATION)
+
+
+def query_key(model: str, dimensions: int | None, text: str) -> str:
+    digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+    return f"{model}|{dimensions or 0}|{digest}"
+
+
+class QueryEmbeddingCache:
+    """In-process LRU + TTL cache of query vectors, optionally backed by Redis."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS, redis=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.redis = redis
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+        self.saved_seconds = 0.0
+        self.miss_latency: float | None = None
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, key: str) -> list[float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, vector = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_local(self, key: str, vector: list[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _redis_call(self, method: str, *args):
+        try:
+            return getattr(self.redis, method)(*args)
+        except Exception:
+            # A cache outage must never fail the query.
+            self.redis_errors += 1
+            return None
+
+    def get(self, key: str) -> list[float] | None:
+        started = time.perf_counter()
+        vector = self._get_local(key)
+        if vector is not None:
+            self.local_hits += 1
+        elif self.redis is not None and (blob := self._redis_call("get", REDIS_PREFIX + key)):
+            vector = array("f", blob).tolist()
+            self._put_local(key, vector)
+            self.redis_hits += 1
+        if vector is None:
+            self.misses += 1
+            self._record(misses=1)
+            return None
+        saved = max(0.0, self._expected_miss_latency() - (time.perf_counter() - started))
+        self.saved_seconds += saved
+        self._record(hits=1, saved_ms=round(saved * 1000))
+        return vector
+
+    def put(self, key: str, vector: list[float], latency: float | None = None) -> None:
+        """Store `vector`; `latency` is how long embedding it took (feeds the saved-time estimate)."""
+        if latency is not None:
+            self.miss_latency = (
+                latency
+                if self.miss_latency is None
+                else (1 - _LATENCY_SMOOTHING) * self.miss_latency + _LATENCY_SMOOTHING * latency
+            )
+            self._record(miss_ms=round(latency * 1000))
+        self._put_local(key, vector)
+        if self.redis is not None:
+            self._redis_call("set", REDIS_PREFIX + key, array("f", vector).tobytes(), int(self.ttl_seconds))
+
+    def _expected_miss_latency(self) -> float:
+        """Seconds an embedding call takes: this process's average, else the one shared in Redis."""
+        if self.miss_latency is None and self.redis is not None:
+            # A fresh (e.g. forked RQ job) process has not timed a miss yet.
+            misses, miss_ms = self._redis_call("hmget", REDIS_STATS_KEY, "misses", "miss_ms") or (None, None)
+            if misses and miss_ms and int(misses):
+                self.miss_latency = int(miss_ms) / int(misses) / 1000
+        return self.miss_latency or 0.0
+
+    def _record(self, **counts: int) -> None:
+        if self.redis is None:
+            return
+        pipe = self._redis_call("pipeline")
+        if pipe is None:
+            return
+        for field, amount in counts.items():
+            pipe.hincrby(REDIS_STATS_KEY, field, amount)
+        try:
+            pipe.execute()
+        except Exception:
+            self.redis_errors += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": len(self._entries),
+            "redis_errors": self.redis_errors,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return (
+            f"Query embedding cache: {stats['hits']} hits ({stats['redis_hits']} from Redis), "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+            f"~{stats['saved_seconds'] * 1000:.0f} ms of embedding latency saved"
+        )
+
+
+def shared_stats(redis) -> dict:
+    """Hit rate and saved latency summed over every process sharing `redis`."""
+    raw = {key.decode(): int(value) for key, value in redis.hgetall(REDIS_STATS_KEY).items()}
+    hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "saved_seconds": raw.get("saved_ms", 0) / 1000,
+    }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """`Embeddings` wrapper that serves `embed_query` from a `QueryEmbeddingCache`.
+
+    Documents go straight to the wrapped model.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.output_dimensionality = getattr(embeddings, "output_dimensionality", None)
+
+    def _key(self, text: str) -> str:
+        return query_key(self.model, self.output_dimensionality, text)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            started = time.perf_counter()
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(key, vector, latency=time.perf_counter() - started)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            started = time.perf_counter()
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(key, vector, latency=time.perf_counter() - started)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+
+def query_cache_from_env(redis=None) -> QueryEmbeddingCache | None:
+    """Cache configured by QUERY_CACHE_SIZE / QUERY_CACHE_TTL (None when disabled)."""
+    max_entries = int(os.getenv("QUERY_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES)))
+    if max_entries <= 0:
+        return None
+    ttl_seconds = float(os.getenv("QUERY_CACHE_TTL", str(DEFAULT_TTL_SECONDS)))
+    return QueryEmbeddingCache(max_entries=max_entries, ttl_seconds=ttl_seconds, redis=redis)
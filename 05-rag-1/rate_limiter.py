@@ -0,0 +1,230 @@
+"""
+Quota-aware rate limiting for embedding batches.
+
+`indexing.py` used to sleep a fixed 60 seconds after every batch of 10 chunks.
+This module replaces that with two token buckets (requests-per-minute and
+tokens-per-minute) so batches go out as fast as the quota allows, and only
+back off when a bucket is empty or the API answers with RESOURCE_EXHAUSTED /
+429 (honouring the retry delay the API suggests when it sends one).
+
+Key pieces:
+- `QuotaRateLimiter.run(fn, requests=..., tokens=...)` waits for capacity,
+  calls `fn` and retries quota errors.
+- `QuotaRateLimiter.run_async(...)` is the same for coroutine functions; all
+  concurrent callers share the buckets.
+- `ThroughputStats` records what was achieved so quotas can be sized.
+"""
+
+import asyncio
+import re
+import time
+
+# Rough characters-per-token ratio for Gemini models. Good enough for quota
+# accounting; the real count is only known server side.
+CHARS_PER_TOKEN = 4
+
+# Cap on the exponential backoff used when the API gives no retry hint.
+MAX_BACKOFF_SECONDS = 60.0
+
+_RETRY_HINT_PATTERNS = [
+    # "Please retry in 23.41s."
+    re.compile(r"retry in\s+([\d.]+)\s*s", re.IGNORECASE),
+    # "'retryDelay': '23s'" (JSON error details)
+    re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?([\d.]+)s", re.IGNORECASE),
+    # "retry_delay { seconds: 23 }" (protobuf text format)
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    # "Retry-After: 23"
+    re.compile(r"retry-after['\"]?\s*[:=]\s*['\"]?([\d.]+)", re.IGNORECASE),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for tokens-per-minute accounting."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """Return True when `exc` (or its cause) is a quota / 429 error."""
+    while exc is not None:
+        message = str(exc)
+        if "RESOURCE_EXHAUSTED" in message or re.search(r"\b429\b", message):
+            return True
+        if getattr(exc, "code", None) == 429 or getattr(exc, "status_code", None) == 429:
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def retry_delay_from_error(exc: BaseException) -> float | None:
+    """Extract the server-suggested retry delay (seconds) from a quota error."""
+    while exc is not None:
+        message = str(exc)
+        for pattern in _RETRY_HINT_PATTERNS:
+            match = pattern.search(message)
+            if match:
+                return float(match.group(1))
+        exc = exc.__cause__
+    return None
+
+
+class TokenBucket:
+    """A bucket refilled continuously at `per_minute / 60` units per second."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.fill_rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.fill_rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 when available now).
+
+        Requests larger than the bucket are clamped to its capacity so a
+        single oversized batch waits for a full bucket instead of forever.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.fill_rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the server reported exhaustion."""
+        self._refill()
+        self.level = 0.0
+
+
+class ThroughputStats:
+    """Counters for a run, reported at the end of indexing."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self.started = clock()
+        self.chunks = 0
+        self.tokens = 0
+        self.requests = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    def record(self, chunks: int, tokens: int) -> None:
+        self.chunks += chunks
+        self.tokens += tokens
+        self.requests += 1
+
+    @property
+    def elapsed(self) -> float:
+        return max(self._clock() - self.started, 1e-9)
+
+    def summary(self) -> str:
+        elapsed = self.elapsed
+        return (
+            f"Achieved throughput: {self.chunks / elapsed:.2f} chunks/s, "
+            f"{self.tokens / elapsed:.0f} tokens/s "
+            f"({self.chunks} chunks, ~{self.tokens} tokens, {self.requests} batches in {elapsed:.1f}s; "
+            f"{self.wait_seconds:.1f}s spent waiting on rate limits, {self.retries} quota retries)"
+        )
+
+
+class QuotaRateLimiter:
+    """Requests-per-minute + tokens-per-minute limiter with 429 backoff.
+
+    `requests` is counted per embedded text because Gemini bills each content
+    of a batch request against the RPM quota.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_retries: int = 5,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute, clock)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock)
+        self.max_retries = max_retries
+        self.stats = ThroughputStats(clock)
+        self._clock = clock
+        self._sleep = sleep
+        self._blocked_until = 0.0
+
+    def _delay(self, requests: int, tokens: int) -> float:
+        return max(
+            self._blocked_until - self._clock(),
+            self.request_bucket.wait_time(requests),
+            self.token_bucket.wait_time(tokens),
+        )
+
+    def _consume(self, requests: int, tokens: int) -> None:
+        self.request_bucket.consume(requests)
+        self.token_bucket.consume(tokens)
+
+    def acquire(self, requests: int, tokens: int) -> None:
+        """Block until both buckets can cover the call, then reserve it."""
+        while (delay := self._delay(requests, tokens)) > 0:
+            self.stats.wait_seconds += delay
+            self._sleep(delay)
+        self._consume(requests, tokens)
+
+    async def acquire_async(self, requests: int, tokens: int) -> None:
+        """`acquire` for asyncio callers; sleeps without blocking the event loop."""
+        while (delay := self._delay(requests, tokens)) > 0:
+            self.stats.wait_seconds += delay
+            await asyncio.sleep(delay)
+        self._consume(requests, tokens)
+
+    def backoff(self, exc: BaseException, attempt: int) -> float:
+        """Pause all callers after a quota error and return the delay chosen."""
+        delay = retry_delay_from_error(exc)
+        if delay is None:
+            delay = min(MAX_BACKOFF_SECONDS, 2.0 ** attempt)
+        self._blocked_until = max(self._blocked_until, self._clock() + delay)
+        # The server says the window is spent; don't burst again right after.
+        self.request_bucket.drain()
+        self.token_bucket.drain()
+        self.stats.retries += 1
+        return delay
+
+    def run(self, fn, *, requests: int, tokens: int):
+        """Call `fn()` within quota, retrying quota errors up to `max_retries`."""
+        attempt = 0
+        while True:
+            self.acquire(requests, tokens)
+            try:
+                result = fn()
+            except Exception as exc:
+                if not is_quota_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = self.backoff(exc, attempt)
+                print(f"Quota exhausted; retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})...")
+                continue
+            self.stats.record(requests, tokens)
+            return result
+
+    async def run_async(self, fn, *, requests: int, tokens: int):
+        """Async variant of `run`; `fn` is a zero-argument coroutine function."""
+        attempt = 0
+        while True:
+            await self.acquire_async(requests, tokens)
+            try:
+                result = await fn()
+            except Exception as exc:
+                if not is_quota_error(exc) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = self.backoff(exc, attempt)
+                print(f"Quota exhausted; retrying in {delay:.1f}s (attempt {attempt}/{self.max_retries})...")
+                continue
+            self.stats.record(requests, tokens)
+            return result
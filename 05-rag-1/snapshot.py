@@ -0,0 +1,279 @@
+"""
+Export / import the vector index as a portable snapshot.
+
+Bringing up a new node used to mean re-running indexing.py: the full
+embedding cost plus hours of rate-limited sleeps. A snapshot holds
+everything Qdrant needs to serve queries, so restoring one is bounded by
+disk and network bandwidth, not by the embedding quota.
+
+Usage:
+    python snapshot.py export DIR [--url QDRANT_URL | --path QDRANT_PATH]
+        [--collection learning_vectors] [--float16]
+    python snapshot.py import DIR [--url QDRANT_URL | --path QDRANT_PATH]
+        [--collection learning_vectors] [--force-recreate | --blue-green] [--workers N] [--batch-size N]
+
+A snapshot is a directory with three files:
+- `manifest.json`: format version, point count, vector size, dtype,
+  distance and the collection metadata (embedding model and dimension);
+- `vectors.bin`: the vectors as one contiguous little-endian float32 (or,
+  with `--float16`, float16) matrix, row i belonging to point i;
+- `points.jsonl.zst`: one `{"id", "payload"}` line per point (plus
+  `"sparse"`, the BM25 vector, for hybrid collections), in the same
+  order, compressed with zstandard.
+
+Key behaviors:
+- Export streams the collection with `scroll`, so memory stays flat.
+- Import memory-maps `vectors.bin`, reads `points.jsonl.zst` as a stream
+  and bulk-uploads the points as they are read with
+  `upload_points(parallel=--workers)` into a Qdrant server, or serially
+  into the embedded local mode (`--path`), so memory stays flat too.
+- The restored collection gets the same payload indexes indexing.py
+  creates. Quantization is not part of the snapshot; re-apply it with
+  `indexing.py --run --quantization MODE`.
+- `--blue-green` restores into the next `learning_vectors_v{N}` and swaps
+  the alias over once it is warm, so a live node can be refreshed too.
+  `--force-recreate` on a name that is an alias does the same: the
+  collection behind a live alias is never dropped in place.
+- An import gives the collection a new index version and drops the
+  answers cached against the index it replaces (answer_cache.py).
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import zstandard
+from qdrant_client import QdrantClient, models
+
+from answer_cache import bump_index_version, index_version, invalidate as invalidate_answers
+from blue_green import alias_target, garbage_collect, next_version, swap_alias, warm_collection
+from filters import ensure_payload_indexes
+from hybrid import SPARSE_VECTOR_NAME, dense_vector, has_sparse_vectors, sparse_vectors_config
+from matryoshka import collection_dimensions
+from qdrant_backend import get_client, is_local
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.bin"
+POINTS_FILE = "points.jsonl.zst"
+
+_SCROLL_PAGE = 1000
+_REPORT_EVERY_SECONDS = 5.0
+
+
+def _flag_value(name, default):
+    """Return the value following `name` in sys.argv (e.g. `--workers 4`), or `default`."""
+    if name in sys.argv:
+        position = sys.argv.index(name)
+        if position + 1 < len(sys.argv):
+            return sys.argv[position + 1]
+    return default
+
+
+COLLECTION_NAME = _flag_value("--collection", "learning_vectors")
+# Default: QDRANT_URL / QDRANT_PATH (see qdrant_backend), else http://localhost:6333.
+QDRANT_URL = _flag_value("--url", None)
+# Embedded local mode: a directory holding the on-disk Qdrant data.
+QDRANT_PATH = _flag_value("--path", None)
+FLOAT16 = "--float16" in sys.argv
+FORCE_RECREATE = "--force-recreate" in sys.argv
+BLUE_GREEN = "--blue-green" in sys.argv
+WORKERS = int(_flag_value("--workers", str(os.cpu_count() or 1)))
+BATCH_SIZE = int(_flag_value("--batch-size", "256"))
+
+
+def _mib(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+def export_snapshot(client: QdrantClient, collection_name: str, directory: Path, float16: bool = False) -> dict:
+    """Write `collection_name` to `directory`; return the manifest."""
+    directory.mkdir(parents=True, exist_ok=True)
+    info = client.get_collection(collection_name)
+    dimensions = collection_dimensions(client, collection_name)
+    hybrid = has_sparse_vectors(client, collection_name)
+    dtype = np.dtype("<f2" if float16 else "<f4")
+    total = client.count(collection_name, exact=True).count
+    started = last_report = time.perf_counter()
+    exported, offset = 0, None
+    compressor = zstandard.ZstdCompressor()
+    with open(directory / VECTORS_FILE, "wb") as vectors_out, open(directory / POINTS_FILE, "wb") as raw_points:
+        with compressor.stream_writer(raw_points) as points_out:
+            while True:
+                points, offset = client.scroll(
+                    collection_name=collection_name,
+                    limit=_SCROLL_PAGE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                if points:
+                    np.asarray([dense_vector(point.vector) for point in points], dtype=dtype).tofile(vectors_out)
+                    for point in points:
+                        line = {"id": point.id, "payload": point.payload}
+                        # A point upserted without text (hence without BM25 terms) has no
+                        # sparse vector; Qdrant may then return the dense one bare.
+                        sparse = point.vector.get(SPARSE_VECTOR_NAME) if isinstance(point.vector, dict) else None
+                        if sparse is not None:
+                            line["sparse"] = {"indices": sparse.indices, "values": sparse.values}
+                        points_out.write(json.dumps(line).encode("utf-8") + b"\n")
+                    exported += len(points)
+                if time.perf_counter() - last_report > _REPORT_EVERY_SECONDS:
+                    last_report = time.perf_counter()
+                    print(f"Exported {exported}/{total} points...")
+                if offset is None:
+                    break
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "collection": collection_name,
+        "points": exported,
+        "dimensions": dimensions,
+        "dtype": dtype.str,
+        "distance": models.Distance.COSINE.value,
+        "sparse_vectors": hybrid,
+        "metadata": info.config.metadata or {},
+        "created_at": time.time(),
+    }
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    size = sum((directory / name).stat().st_size for name in (VECTORS_FILE, POINTS_FILE, MANIFEST_FILE))
+    print(
+        f"Exported {exported} points x {dimensions} dims from {collection_name} to {directory} "
+        f"({_mib(size)}, {time.perf_counter() - started:.1f}s)."
+    )
+    return manifest
+
+
+def read_manifest(directory: Path) -> dict:
+    manifest = json.loads((directory / MANIFEST_FILE).read_text())
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {manifest.get('format')!r} in {directory}")
+    return manifest
+
+
+def read_points(directory: Path) -> Iterator[dict]:
+    """The `{"id", "payload"}` (plus `"sparse"`) records of a snapshot, one at a time, in vector order."""
+    with open(directory / POINTS_FILE, "rb") as raw_points:
+        with zstandard.ZstdDecompressor().stream_reader(raw_points) as reader:
+            for line in _lines(reader):
+                yield json.loads(line)
+
+
+def count_points(directory: Path) -> int:
+    with open(directory / POINTS_FILE, "rb") as raw_points:
+        with zstandard.ZstdDecompressor().stream_reader(raw_points) as reader:
+            return sum(1 for _ in _lines(reader))
+
+
+def _lines(reader, block_size: int = 1024 * 1024):
+    pending = b""
+    while block := reader.read(block_size):
+        pending += block
+        *lines, pending = pending.split(b"\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _snapshot_points(vectors: np.ndarray, records: Iterator[dict], hybrid: bool) -> Iterator[models.PointStruct]:
+    for dense, record in zip(vectors, records):
+        vector = dense.astype(np.float32).tolist()
+        if hybrid:
+            vector = {"": vector}
+            if record.get("sparse") is not None:
+                vector[SPARSE_VECTOR_NAME] = models.SparseVector(**record["sparse"])
+        yield models.PointStruct(id=record["id"], vector=vector, payload=record["payload"])
+
+
+def import_snapshot(
+    client: QdrantClient,
+    collection_name: str,
+    directory: Path,
+    workers: int = 1,
+    batch_size: int = 256,
+    force_recreate: bool = False,
+) -> int:
+    """Create `collection_name` from the snapshot in `directory`; return the number of points."""
+    manifest = read_manifest(directory)
+    count, dimensions = manifest["points"], manifest["dimensions"]
+    # Rows are converted to float32 one at a time as they are uploaded.
+    vectors = np.memmap(directory / VECTORS_FILE, dtype=np.dtype(manifest["dtype"]), mode="r", shape=(count, dimensions))
+    hybrid = manifest.get("sparse_vectors", False)
+    listed = count_points(directory)
+    if listed != count:
+        raise ValueError(f"Snapshot {directory} lists {listed} points but its manifest says {count}")
+
+    if alias_target(client, collection_name) is not None:
+        raise SystemExit(f"{collection_name} is an alias; import with --blue-green to replace its collection.")
+    if client.collection_exists(collection_name):
+        if not force_recreate:
+            raise SystemExit(f"Collection {collection_name} already exists; add --force-recreate or --blue-green.")
+        client.delete_collection(collection_name)
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(size=dimensions, distance=models.Distance(manifest["distance"])),
+        sparse_vectors_config=sparse_vectors_config() if hybrid else None,
+        metadata=manifest["metadata"] or None,
+    )
+    ensure_payload_indexes(client, collection_name)
+
+    started = time.perf_counter()
+    client.upload_points(
+        collection_name=collection_name,
+        points=_snapshot_points(vectors, read_points(directory), hybrid),
+        batch_size=batch_size,
+        # The embedded local mode lives in this process only.
+        parallel=1 if is_local(QDRANT_URL, QDRANT_PATH) else workers,
+        wait=True,
+    )
+    elapsed = time.perf_counter() - started
+    stored = client.count(collection_name, exact=True).count
+    # The manifest metadata carries the exported index_version; the restored
+    # contents replace whatever answers were cached against, so start a new one.
+    bump_index_version(client, collection_name)
+    print(
+        f"Imported {stored} points x {dimensions} dims into {collection_name} in {elapsed:.1f}s "
+        f"({stored / elapsed if elapsed else 0:.0f} points/s, {_mib(vectors.nbytes)} of vectors)."
+    )
+    return stored
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import"):
+        raise SystemExit(__doc__)
+    command, directory = sys.argv[1], Path(sys.argv[2])
+    client = get_client(QDRANT_URL, QDRANT_PATH)
+
+    if command == "export":
+        export_snapshot(client, COLLECTION_NAME, directory, float16=FLOAT16)
+        return
+
+    live_collection = alias_target(client, COLLECTION_NAME)
+    # Dropping the collection behind the alias would drop the alias with it:
+    # recreate it blue/green instead, as indexing.py does.
+    if not (BLUE_GREEN or (FORCE_RECREATE and live_collection is not None)):
+        # Without --force-recreate an existing collection (aliased or not) is refused.
+        target = live_collection or COLLECTION_NAME
+        import_snapshot(client, target, directory, WORKERS, BATCH_SIZE, force_recreate=FORCE_RECREATE)
+        invalidate_answers(client, keep_version=index_version(client, target))
+        return
+    # Restore next to the live collection, then swap the alias over to it.
+    target = next_version(client, COLLECTION_NAME)
+    import_snapshot(client, target, directory, WORKERS, BATCH_SIZE)
+    warm_seconds = warm_collection(client, target)
+    previous = swap_alias(client, COLLECTION_NAME, target)
+    print(f"Alias {COLLECTION_NAME} now points to {target} (was {previous or 'unset'}; warmed in {warm_seconds:.1f}s).")
+    # Answers cached against the previous version stop matching; drop them.
+    invalidate_answers(client, keep_version=index_version(client, target))
+    removed = garbage_collect(client, COLLECTION_NAME)
+    if removed:
+        print(f"Deleted old collection versions: {', '.join(removed)}")
+
+
+# upload_points(parallel=N) starts worker processes, which re-import this module.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Streaming, page-at-a-time chunking.
+
+`PyPDFLoader(mode="single")` concatenates the whole PDF into one string and
+`split_documents` then materializes every chunk before the first embedding
+call. For PDFs with hundreds of MB of text that spikes memory and delays
+indexing until parsing is done.
+
+`StreamingSplitter` instead consumes pages one by one (e.g. from
+`PyPDFLoader(mode="page").lazy_load()`), splits a small rolling window with
+the regular text splitter, and yields every chunk except the last one, which
+is carried over because it may continue on the next page. Chunks keep their
+overlap across page boundaries, the output matches single-document splitting
+(up to the window edges), and peak memory depends on the window size, not on
+the document size.
+
+Page numbers survive the concatenation: the splitter records where every
+page starts in its buffer and maps each chunk's offsets back to the pages it
+spans, so chunks are cited by page without embedding one document per page.
+"""
+
+from bisect import bisect_right
+from typing import Iterable, Iterator
+
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+# Same delimiter PyPDFLoader uses between pages in "single" mode.
+PAGES_DELIMITER = "\n\f"
+
+# Page-specific keys that do not describe a chunk spanning several pages.
+_PAGE_KEYS = ("page", "page_label")
+
+
+def chunk_spans(splitter: TextSplitter, text: str) -> list[tuple[int, int]]:
+    """`(start, end)` offsets of the chunks `splitter` makes from `text`."""
+    if hasattr(splitter, "split_spans"):
+        return splitter.split_spans(text)
+    # Chunks come out in order (overlapping at most), so each one is found
+    # by searching forward from the previous chunk's start.
+    spans = []
+    cursor = 0
+    for chunk in splitter.split_text(text):
+        start = text.find(chunk, cursor)
+        if start < 0:
+            # Guessing an offset would store other text under the wrong pages.
+            raise ValueError(
+                f"{type(splitter).__name__} produced a chunk that is not a substring of its input; "
+                "give it a split_spans() method"
+            )
+        spans.append((start, start + len(chunk)))
+        cursor = start + 1
+    return spans
+
+
+class StreamingSplitter:
+    """Incrementally split a stream of page documents into chunks.
+
+    When the pages carry `page` / `page_label` metadata, the offset where
+    each page starts in the buffer is recorded, and every chunk gets the
+    pages its span covers (bisect over the page offsets): `page` and
+    `page_end` (0-based, inclusive) and a `page_label` such as "12" or
+    "12-14". With `window_chunks=None` nothing is split before `flush()`,
+    which reproduces `PyPDFLoader(mode="single")` chunking exactly while
+    keeping page numbers.
+    """
+
+    def __init__(
+        self,
+        splitter: TextSplitter,
+        chunk_size: int = 0,
+        window_chunks: int | None = 4,
+        delimiter: str = PAGES_DELIMITER,
+    ):
+        self.splitter = splitter
+        self.delimiter = delimiter
+        # Split once the carried-over text reaches this many characters.
+        self.window = chunk_size * window_chunks if window_chunks else None
+        self._buffer = ""
+        self._metadata: dict | None = None
+        self._started = False
+        # Start offset in the buffer, page index and label of buffered pages.
+        self._page_starts: list[int] = []
+        self._pages: list[tuple[int, str]] = []
+
+    def _page_metadata(self, start: int, end: int) -> dict:
+        if not self._page_starts:
+            return {}
+        first = max(bisect_right(self._page_starts, start) - 1, 0)
+        last = max(bisect_right(self._page_starts, max(end - 1, start)) - 1, first)
+        (first_page, first_label), (last_page, last_label) = self._pages[first], self._pages[last]
+        label = first_label if first == last else f"{first_label}-{last_label}"
+        return {"page": first_page, "page_end": last_page, "page_label": label}
+
+    def _documents(self, spans: list[tuple[int, int]]) -> list[Document]:
+        return [
+            Document(
+                page_content=self._buffer[start:end],
+                metadata=dict(self._metadata or {}) | self._page_metadata(start, end),
+            )
+            for start, end in spans
+        ]
+
+    def _drop_before(self, offset: int) -> None:
+        """Cut the buffer at `offset` and rebase the page offsets onto it."""
+        self._buffer = self._buffer[offset:]
+        # Keep the page that contains `offset` and everything after it.
+        keep = max(bisect_right(self._page_starts, offset) - 1, 0)
+        self._page_starts = [max(start - offset, 0) for start in self._page_starts[keep:]]
+        self._pages = self._pages[keep:]
+
+    def feed(self, page: Document) -> list[Document]:
+        """Add one page and return the chunks that can no longer change."""
+        if self._metadata is None:
+            self._metadata = {k: v for k, v in page.metadata.items() if k not in _PAGE_KEYS}
+        if self._started:
+            self._buffer += self.delimiter
+        if "page" in page.metadata:
+            self._page_starts.append(len(self._buffer))
+            self._pages.append((page.metadata["page"], str(page.metadata.get("page_label", page.metadata["page"] + 1))))
+        self._buffer += page.page_content
+        self._started = True
+        if self.window is None or len(self._buffer) < self.window:
+            return []
+        spans = chunk_spans(self.splitter, self._buffer)
+        if len(spans) < 2:
+            return []
+        # Carry the last chunk (from where it starts) into the next window so
+        # it can grow with the next page; the chunks before it are final and
+        # already contain their overlap.
+        documents = self._documents(spans[:-1])
+        self._drop_before(spans[-1][0])
+        return documents
+
+    def flush(self) -> list[Document]:
+        """Return the remaining chunks once the last page has been fed."""
+        documents = self._documents(chunk_spans(self.splitter, self._buffer)) if self._buffer else []
+        self._buffer = ""
+        self._page_starts, self._pages = [], []
+        return documents
+
+    def split_pages(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Lazily yield the chunks of `pages`."""
+        for page in pages:
+            yield from self.feed(page)
+        yield from self.flush()
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable into lists of `size` items without materializing it."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
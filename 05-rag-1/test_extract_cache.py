@@ -0,0 +1,48 @@
+# test_extract_cache.py
+from langchain_core.documents import Document
+
+import extract_cache
+from extract_cache import ExtractionCache
+
+
+def _extract(pages: int):
+    for number in range(pages):
+        yield Document(page_content=f"page {number} " * 50, metadata={"page": number, "page_label": str(number + 1)})
+
+
+def _pending_pages(cache: ExtractionCache) -> int:
+    return cache._conn.execute(
+        "SELECT COUNT(*) FROM pages WHERE key LIKE ?", (extract_cache._PENDING_PREFIX + "%",)
+    ).fetchone()[0]
+
+
+def test_miss_writes_pages_in_batches(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF fake")
+    cache = ExtractionCache(tmp_path / "cache.sqlite")
+    total = extract_cache._WRITE_BATCH * 10
+    pages = cache.pages(pdf, lambda: _extract(total))
+    for read, _ in enumerate(pages, start=1):
+        # Everything but the current batch is already on disk, not in memory.
+        assert _pending_pages(cache) >= read - extract_cache._WRITE_BATCH
+        if read == total // 2:
+            # Half-written: the entry is not visible yet.
+            assert cache._lookup(cache.make_key(extract_cache.file_sha256(pdf))) is None
+    assert _pending_pages(cache) == 0
+    cached = list(cache.pages(pdf, lambda: _extract(0)))
+    assert cache.hits == 1
+    assert [doc.metadata["page"] for doc in cached] == list(range(total))
+    assert cached[-1].page_content == f"page {total - 1} " * 50
+
+
+def test_interrupted_miss_leaves_no_entry(tmp_path):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF fake")
+    cache = ExtractionCache(tmp_path / "cache.sqlite")
+    pages = cache.pages(pdf, lambda: _extract(extract_cache._WRITE_BATCH * 3))
+    for read, _ in enumerate(pages, start=1):
+        if read == extract_cache._WRITE_BATCH * 2:
+            break
+    pages.close()
+    assert _pending_pages(cache) == 0
+    assert list(cache.pages(pdf, lambda: _extract(2))) and cache.misses == 2
@@ -0,0 +1,226 @@
+"""
+Token-budgeted chunking with tiktoken.
+
+`RecursiveCharacterTextSplitter(chunk_size=3000)` measures characters, so the
+token count of a chunk swings with the content (prose vs. code listings vs.
+tables). `TokenBudgetSplitter` targets a token budget instead, using the same
+tokenizer as `01-tokenization/main.py` (`tiktoken.encoding_for_model("gpt-4o")`):
+
+- each text is encoded once, through a multi-threaded `encode_batch` call
+  (long texts are cut into line-aligned segments first, several documents
+  are batched together);
+- chunks are windows over the token ids, never longer than `chunk_tokens`,
+  with `overlap_tokens` shared between neighbours;
+- the cut is moved back to the nearest paragraph / line / word boundary in
+  the last quarter of the window, so chunks don't end mid-word;
+- encodings and per-token boundary ranks are cached, so splitting costs one
+  encode plus a short scan near each cut.
+
+It is a LangChain `TextSplitter`, so it drops into `indexing.py` (and the
+streaming splitter) in place of the character splitter.
+"""
+
+import os
+from functools import lru_cache, partial
+from typing import Any, Iterable, Iterator
+
+import tiktoken
+from langchain_core.documents import Document
+from langchain_text_splitters import TextSplitter
+
+DEFAULT_MODEL = "gpt-4o"
+
+# Only look for a nicer cut point in the last quarter of the window.
+_BOUNDARY_SEARCH_FRACTION = 0.25
+
+# Long texts are encoded as ~64 KB line-aligned segments in one multi-threaded
+# `encode_batch` call instead of a single-threaded `encode`.
+_ENCODE_SEGMENT_CHARS = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Cached tiktoken encoding (loading the BPE ranks is the slow part)."""
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def _encoded_length(encoding: tiktoken.Encoding, text: str) -> int:
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenBudgetSplitter(TextSplitter):
+    """Split text into chunks of at most `chunk_tokens` tokens."""
+
+    def __init__(
+        self,
+        chunk_tokens: int = 750,
+        overlap_tokens: int = 50,
+        model: str = DEFAULT_MODEL,
+        encoding: tiktoken.Encoding | None = None,
+        **kwargs: Any,
+    ):
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than chunk_tokens ({chunk_tokens})")
+        self.encoding = encoding or get_encoding(model)
+        super().__init__(
+            chunk_size=chunk_tokens,
+            chunk_overlap=overlap_tokens,
+            # A partial (not a lambda) keeps the splitter picklable for process pools.
+            length_function=partial(_encoded_length, self.encoding),
+            **kwargs,
+        )
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._ranks: dict[int, int] = {}
+        self._char_starts: dict[int, bool] = {}
+
+    def _boundary_rank(self, token: int) -> int:
+        """How good a place it is to start a chunk at `token` (higher is better)."""
+        rank = self._ranks.get(token)
+        if rank is None:
+            piece = self.encoding.decode_single_token_bytes(token)
+            if b"\n\n" in piece:
+                rank = 3
+            elif piece.startswith(b"\n"):
+                rank = 2
+            elif piece.startswith(b" "):
+                rank = 1
+            else:
+                rank = 0
+            self._ranks[token] = rank
+        return rank
+
+    def _starts_char(self, token: int) -> bool:
+        """Whether `token` begins a character (not a UTF-8 continuation byte).
+
+        Byte-level BPE encodes rare characters (CJK, emoji, some accented
+        letters) as several tokens; cutting between them would decode to U+FFFD.
+        """
+        starts = self._char_starts.get(token)
+        if starts is None:
+            starts = self._char_starts[token] = self.encoding.decode_single_token_bytes(token)[0] & 0xC0 != 0x80
+        return starts
+
+    def _char_boundary(self, tokens: list[int], position: int, floor: int) -> int:
+        """Nearest character boundary at or before `position`, else the first one after it.
+
+        Boundaries are token indices > `floor` (or the end of `tokens`).
+        """
+        back = position
+        while back > floor and back < len(tokens) and not self._starts_char(tokens[back]):
+            back -= 1
+        if back > floor:
+            return back
+        while position < len(tokens) and not self._starts_char(tokens[position]):
+            position += 1
+        return position
+
+    def _encode(self, text: str) -> list[int]:
+        if len(text) <= _ENCODE_SEGMENT_CHARS:
+            return self.encoding.encode(text, disallowed_special=())
+        segments = []
+        start = 0
+        while start < len(text):
+            end = text.find("\n", start + _ENCODE_SEGMENT_CHARS)
+            end = len(text) if end == -1 else end + 1
+            segments.append(text[start:end])
+            start = end
+        tokens: list[int] = []
+        for part in self.encoding.encode_batch(segments, num_threads=os.cpu_count() or 1, disallowed_special=()):
+            tokens.extend(part)
+        return tokens
+
+    def _cut(self, tokens: list[int], start: int, limit: int) -> int:
+        """End index (exclusive) for the chunk starting at `start`."""
+        if limit >= len(tokens):
+            return len(tokens)
+        earliest = limit - max(1, int(self.chunk_tokens * _BOUNDARY_SEARCH_FRACTION))
+        best, best_rank = limit, 0
+        rank_of = self._boundary_rank
+        for position in range(limit, max(earliest, start + 1) - 1, -1):
+            rank = rank_of(tokens[position])
+            if rank > best_rank:
+                best, best_rank = position, rank
+                if rank == 3:
+                    break
+        # Boundary tokens start with whitespace; the fallback may not.
+        return best if best_rank else self._char_boundary(tokens, best, start)
+
+    def _token_spans(self, tokens: list[int]) -> Iterator[tuple[int, int]]:
+        """`(start, end)` token indices of the chunks, both on character boundaries."""
+        start = 0
+        while start < len(tokens):
+            end = self._cut(tokens, start, start + self.chunk_tokens)
+            yield start, end
+            if end >= len(tokens):
+                break
+            start = self._char_boundary(tokens, max(end - self.overlap_tokens, start + 1), start)
+
+    def _strip(self, text: str) -> tuple[str, int]:
+        """`text` stripped as configured, and how many characters were cut from its front."""
+        if not self._strip_whitespace:
+            return text, 0
+        stripped = text.lstrip()
+        return stripped.rstrip(), len(text) - len(stripped)
+
+    def _split_tokens(self, tokens: list[int]) -> list[str]:
+        chunks: list[str] = []
+        for start, end in self._token_spans(tokens):
+            text, _ = self._strip(self.encoding.decode(tokens[start:end]))
+            if text:
+                chunks.append(text)
+        return chunks
+
+    def split_text(self, text: str) -> list[str]:
+        return self._split_tokens(self._encode(text))
+
+    def split_spans(self, text: str) -> list[tuple[int, int]]:
+        """`(start, end)` character offsets of the chunks in `text` (see `streaming.chunk_spans`).
+
+        Computed from the token byte lengths, so they are exact even where
+        decoding a chunk on its own would not find it in `text` again.
+        """
+        tokens = self._encode(text)
+        data = text.encode("utf-8")
+        byte_offsets = [0]
+        for token in tokens:
+            byte_offsets.append(byte_offsets[-1] + len(self.encoding.decode_single_token_bytes(token)))
+        # Chunk starts (and ends) only move forward: convert byte offsets to
+        # character offsets incrementally instead of decoding from 0 each time.
+        cursors = {"start": [0, 0], "end": [0, 0]}
+
+        def char_offset(kind: str, byte: int) -> int:
+            cursor = cursors[kind]
+            if byte < cursor[0]:
+                cursor[:] = [0, 0]
+            cursor[1] += len(data[cursor[0] : byte].decode("utf-8"))
+            cursor[0] = byte
+            return cursor[1]
+
+        spans = []
+        for start, end in self._token_spans(tokens):
+            first, last = char_offset("start", byte_offsets[start]), char_offset("end", byte_offsets[end])
+            chunk, leading = self._strip(text[first:last])
+            if chunk:
+                spans.append((first + leading, first + leading + len(chunk)))
+        return spans
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        documents = list(documents)
+        if len(documents) == 1:
+            # A whole PDF in "single" mode: segment it for the threaded encoder.
+            encoded = [self._encode(documents[0].page_content)]
+        else:
+            # One batched (multi-threaded) encode for all documents.
+            encoded = self.encoding.encode_batch(
+                [doc.page_content for doc in documents], num_threads=os.cpu_count() or 1, disallowed_special=()
+            )
+        chunks: list[Document] = []
+        for document, tokens in zip(documents, encoded):
+            for text in self._split_tokens(tokens):
+                chunks.append(Document(page_content=text, metadata=dict(document.metadata)))
+        return chunks
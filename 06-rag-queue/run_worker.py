@@ -6,12 +6,17 @@ Usage:
 
 Note: RQ's scheduler uses forking on Unix; for scheduling on Windows consider using a separate scheduler
 process or run workers inside WSL/Linux.
+
+Jobs run in this process, so the vector store and chat model clients (task_queue.resources) are created
+once at start-up and reused by every job.
 """
 import os
 from redis import Redis
 from rq import Queue
 from rq.worker import SimpleWorker
 
+from task_queue.worker import resources
+
 
 def get_redis_connection():
     url = os.environ.get("REDIS_URL") or os.environ.get("REDIS_HOST")
@@ -29,6 +34,11 @@ def main():
     conn = get_redis_connection()
     q = Queue(connection=conn)
     worker = SimpleWorker([q], connection=conn)
+    try:
+        resources.warm()
+    except Exception as exc:
+        # Qdrant may come up after the worker; the first job connects then.
+        print(f"Could not warm up worker clients: {exc}")
     # blocking worker; exits only on keyboard interrupt
     worker.work()
 
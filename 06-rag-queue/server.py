@@ -1,6 +1,10 @@
-from fastapi import FastAPI, Query
-from task_queue.connection import queue
-from task_queue.worker import process_query
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from task_queue.connection import queue, redis_conn
+from task_queue.token_stream import format_sse, read_events
+from task_queue.worker import process_query, query_cache_stats
+# 05-rag-1 is on sys.path once task_queue.worker is imported.
+from filters import parse_page_range
 
 app = FastAPI()
 
@@ -10,11 +14,66 @@ def root():
     return {"message": "Server is up and running!"}
 
 
+@app.get("/stats/query-cache")
+def get_query_cache_stats():
+    """Query-embedding cache hit rate and embedding latency saved, summed over all workers."""
+    return query_cache_stats()
+
+
 @app.post("/chat")
-def enqueue_chat(query: str = Query(..., description="Chat Message")):
+def enqueue_chat(
+    query: str = Query(..., description="Chat Message"),
+    source: str | None = Query(None, description="Only search chunks from this source file"),
+    pages: str | None = Query(None, description="Only search these pages, e.g. 12 or 10-20"),
+):
     """Enqueue `process_query` with the provided query and return the job id."""
-    job = queue.enqueue(process_query, query)
-    return {"status": "queued", "job_id": job.id}
+    try:
+        parse_page_range(pages)
+    except ValueError as exc:
+        # int() failures ("abc") and inverted ranges alike.
+        raise HTTPException(status_code=422, detail=f"Invalid pages {pages!r}: {exc}")
+    job = queue.enqueue(process_query, query, source, pages)
+    return {"status": "queued", "job_id": job.id, "stream_url": f"/stream/{job.id}"}
+
+
+@app.get("/stream/{job_id}")
+def stream_results(job_id: str, last_event_id: str | None = Header(None)):
+    """Relay a job's answer tokens as Server-Sent Events (`token`, then `done` or `error`).
+
+    Events replay from the start of the job's stream, or after `Last-Event-ID`
+    when a client reconnects.
+    """
+
+    def events():
+        for entry in read_events(redis_conn, job_id, last_id=last_event_id or "0"):
+            if entry is not None:
+                entry_id, event, data = entry
+                yield format_sse(event, data, entry_id)
+                continue
+            # Nothing for a while: keep the connection open unless the job
+            # cannot publish anything anymore (unknown, finished or failed,
+            # with its final event lost, trimmed or expired).
+            job = queue.fetch_job(job_id)
+            if job is None:
+                yield format_sse("error", {"error": "job not found"})
+                return
+            if getattr(job, "is_finished", False):
+                if job.result is None:
+                    yield format_sse("error", {"error": "No answer was generated"})
+                else:
+                    yield format_sse("done", {"answer": job.result})
+                return
+            if getattr(job, "is_failed", False):
+                yield format_sse("error", {"error": job.exc_info})
+                return
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are written.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/results/{job_id}")
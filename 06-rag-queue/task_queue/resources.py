@@ -0,0 +1,147 @@
+"""
+Long-lived clients of an RQ worker process.
+
+`process_query` used to build a vector store (a collection-info round trip
+plus the dimension check) and a new `ChatGoogleGenerativeAI` for every
+job. `WorkerResources` creates them on first use and keeps them for the
+life of the process, so a job only pays for its search and generation
+calls:
+
+- the vector store wraps the process-wide Qdrant client of
+  `qdrant_backend.get_client()`, whose HTTP connection pool keeps its
+  connections alive between jobs;
+- the chat model keeps its Gemini client (and connections) the same way;
+- the semantic answer cache is opened once as well.
+
+Key behaviors:
+- Everything is created lazily, in the process that uses it: importing the
+  module (the API server does) connects to nothing, and a process forked
+  after the clients were built rebuilds its own instead of sharing sockets
+  with its parent.
+- The vector store is health-checked (one collection-info call) when it
+  has been idle for `HEALTH_CHECK_SECONDS` (default 30); a failed check,
+  or a failed search reported through `discard_vector_store()`, rebuilds
+  the Qdrant client and the store. A changed collection layout (e.g. a
+  blue/green rebuild that added BM25 vectors) is picked up the same way.
+- `discard_chat_model()` drops the chat model after a failed call; the
+  next job creates a fresh one.
+- Reuse across jobs needs a worker that runs jobs in its own process:
+  `run_worker.py` and `worker.sh` start RQ's `SimpleWorker` (a forking
+  worker would rebuild everything for every job).
+"""
+
+import os
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_qdrant import QdrantVectorStore, RetrievalMode
+
+# 05-rag-1 modules, on sys.path through task_queue.worker.
+from answer_cache import AnswerCache, answer_cache_from_env
+from hybrid import has_sparse_vectors, make_vector_store
+from matryoshka import check_collection_dimensions
+from qdrant_backend import get_client, reset_client
+
+CHAT_MODEL = "gemini-2.5-flash"
+DEFAULT_HEALTH_CHECK_SECONDS = 30.0
+
+
+class WorkerResources:
+    """Per-process vector store, chat model and answer cache, built on first use."""
+
+    def __init__(
+        self,
+        collection_name: str,
+        embeddings: Embeddings,
+        dimensions: int | None,
+        health_check_seconds: float = DEFAULT_HEALTH_CHECK_SECONDS,
+    ):
+        self.collection_name = collection_name
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+        self.health_check_seconds = health_check_seconds
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._vector_store: QdrantVectorStore | None = None
+        self._chat_model: ChatGoogleGenerativeAI | None = None
+        self._answer_cache: AnswerCache | None = None
+        self._answer_cache_loaded = False
+        self._last_used = 0.0
+
+    def _check_process(self) -> None:
+        """Drop clients inherited through fork(); they belong to the parent."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._vector_store = None
+            self._chat_model = None
+            self._answer_cache = None
+            self._answer_cache_loaded = False
+
+    def _build_vector_store(self) -> QdrantVectorStore:
+        vector_store = make_vector_store(get_client(), self.collection_name, self.embeddings)
+        check_collection_dimensions(vector_store.client, self.collection_name, self.dimensions)
+        return vector_store
+
+    def _healthy(self, vector_store: QdrantVectorStore) -> bool:
+        """One round trip: the collection answers and its layout matches the store."""
+        try:
+            hybrid = has_sparse_vectors(vector_store.client, self.collection_name)
+        except Exception as exc:
+            print(f"Vector store health check failed: {exc}")
+            return False
+        return hybrid == (vector_store.retrieval_mode == RetrievalMode.HYBRID)
+
+    def vector_store(self) -> QdrantVectorStore:
+        """The process's vector store; rebuilt after a failed health check."""
+        with self._lock:
+            self._check_process()
+            now = time.monotonic()
+            if self._vector_store is not None and now - self._last_used > self.health_check_seconds:
+                if not self._healthy(self._vector_store):
+                    self._discard_vector_store()
+            if self._vector_store is None:
+                self._vector_store = self._build_vector_store()
+            self._last_used = now
+            return self._vector_store
+
+    def _discard_vector_store(self) -> None:
+        if self._vector_store is not None:
+            self.rebuilds += 1
+        self._vector_store = None
+        self._answer_cache = None
+        self._answer_cache_loaded = False
+        reset_client()
+
+    def discard_vector_store(self) -> None:
+        """Forget the vector store and its Qdrant client (after a failed call)."""
+        with self._lock:
+            self._discard_vector_store()
+
+    def chat_model(self) -> ChatGoogleGenerativeAI:
+        with self._lock:
+            self._check_process()
+            if self._chat_model is None:
+                self._chat_model = ChatGoogleGenerativeAI(model=CHAT_MODEL)
+            return self._chat_model
+
+    def discard_chat_model(self) -> None:
+        with self._lock:
+            self._chat_model = None
+
+    def answer_cache(self) -> AnswerCache | None:
+        """The semantic answer cache (None when `ANSWER_CACHE=0`)."""
+        with self._lock:
+            self._check_process()
+            if not self._answer_cache_loaded:
+                self._answer_cache = answer_cache_from_env(get_client(), self.collection_name)
+                self._answer_cache_loaded = True
+            return self._answer_cache
+
+    def warm(self) -> None:
+        """Create every client now (worker start-up) instead of in the first job."""
+        self.vector_store()
+        self.chat_model()
+        self.answer_cache()
@@ -0,0 +1,103 @@
+"""
+Per-job token streams in Redis, relayed to clients as Server-Sent Events.
+
+Without streaming, a client sees nothing until the whole answer has been
+generated and it polls `/results/{job_id}`. With it, `process_query` uses the
+chat model's `stream()` API and appends every token delta to a Redis stream
+keyed by the RQ job ID:
+
+    rag:tokens:{job_id}   XADD  event=token data={"delta": "..."}
+                                event=done  data={"answer": "..."}
+                                event=error data={"error": "..."}
+
+`GET /stream/{job_id}` on the API server reads it with blocking `XREAD` and
+forwards each entry as an SSE event, so the first token reaches the client
+after retrieval plus first-token latency instead of the full generation
+time.
+
+Key behaviors:
+- A Redis stream rather than pub/sub: entries are kept (for
+  `STREAM_TTL_SECONDS`, default one hour), so a client that connects late,
+  or reconnects with `Last-Event-ID`, replays what it missed.
+- Every job ends its stream with exactly one `done` or `error` entry;
+  answer-cache hits arrive as a single token.
+- Publishing errors are swallowed: a Redis outage must not fail a job whose
+  answer is still stored as the RQ result. When the final entry is missing
+  (lost, trimmed or expired), `/stream/{job_id}` ends the stream from the
+  job's RQ status and result instead.
+"""
+
+import json
+import os
+from collections.abc import Iterator
+
+STREAM_PREFIX = "rag:tokens:"
+DEFAULT_TTL_SECONDS = 60 * 60
+# Upper bound on entries per stream (approximate trimming).
+MAX_ENTRIES = 10_000
+FINAL_EVENTS = ("done", "error")
+
+
+def stream_key(job_id: str) -> str:
+    return STREAM_PREFIX + job_id
+
+
+class TokenPublisher:
+    """Appends one job's token deltas and final answer to its Redis stream."""
+
+    def __init__(self, redis, job_id: str, ttl_seconds: float | None = None):
+        self.redis = redis
+        self.key = stream_key(job_id)
+        self.ttl_seconds = int(ttl_seconds or os.getenv("STREAM_TTL_SECONDS", str(DEFAULT_TTL_SECONDS)))
+        self.tokens = 0
+        self.closed = False
+        self.errors = 0
+
+    def _publish(self, event: str, **data) -> None:
+        try:
+            pipe = self.redis.pipeline()
+            pipe.xadd(self.key, {"event": event, "data": json.dumps(data)}, maxlen=MAX_ENTRIES, approximate=True)
+            pipe.expire(self.key, self.ttl_seconds)
+            pipe.execute()
+        except Exception:
+            self.errors += 1
+
+    def token(self, delta: str) -> None:
+        if delta:
+            self.tokens += 1
+            self._publish("token", delta=delta)
+
+    def close(self, answer: str | None, error: str = "No answer was generated") -> None:
+        """End the stream with the answer, or with `error` when there is none."""
+        if self.closed:
+            return
+        self.closed = True
+        if answer is None:
+            self._publish("error", error=error)
+        else:
+            self._publish("done", answer=answer)
+
+
+def read_events(redis, job_id: str, last_id: str = "0", block_ms: int = 15_000) -> Iterator[tuple[str, str, dict] | None]:
+    """Yield `(entry_id, event, data)` from `last_id` on; `None` each time `block_ms` passes without one.
+
+    Stops after the `done` / `error` entry.
+    """
+    key = stream_key(job_id)
+    while True:
+        response = redis.xread({key: last_id}, count=100, block=block_ms)
+        if not response:
+            yield None
+            continue
+        for entry_id, fields in response[0][1]:
+            last_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            event = fields[b"event"].decode()
+            yield last_id, event, json.loads(fields[b"data"])
+            if event in FINAL_EVENTS:
+                return
+
+
+def format_sse(event: str, data: dict, event_id: str | None = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
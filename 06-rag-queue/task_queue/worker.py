@@ -8,18 +8,49 @@ initialization at import-time (so importing it from the web server is safe).
 Key behaviors:
 - Load `GOOGLE_API_KEY` from environment or prompt interactively.
 - Support `--dry-run` to validate retrieval without calling LLMs.
-- Lazily create the Qdrant vector store client when processing a query.
+- Stream the answer's tokens to a per-job Redis stream while generating
+  (`task_queue.token_stream`), which the API server relays over SSE.
+- Lazily create the Qdrant vector store, chat model and answer cache once
+  per worker process and reuse them across jobs (`task_queue.resources`),
+  health-checking the vector store and rebuilding clients after failures.
+- Serve repeat queries' embeddings from a cache (in-process LRU + TTL,
+  shared through the queue's Redis unless `QUERY_CACHE_REDIS=0`).
+- Answer near-duplicate questions from the semantic answer cache (a small
+  Qdrant collection next to `learning_vectors`) without calling the LLM,
+  as long as the index has not changed since (`ANSWER_CACHE=0` disables;
+  `ANSWER_CACHE_THRESHOLD`, default 0.95, is the cosine similarity a
+  question needs to reuse an answer).
+- Fuse dense and BM25 sparse results (hybrid search) when the collection
+  stores sparse vectors.
+- Search with quantization-aware parameters (oversample + rescore) shared
+  with `05-rag-1/chat.py`.
+- Embed queries at the configured `EMBED_DIMENSIONS` and fail fast when the
+  collection was indexed with another dimension.
+- Connect to the Qdrant server at `QDRANT_URL`, or open the embedded local
+  mode when `QDRANT_PATH` is set (run a single `run_worker.py` worker then:
+  a local directory can only be opened by one process).
 """
 
-from langchain_qdrant import QdrantVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from rq import get_current_job
 import os
 import sys
 import getpass
 from dotenv import load_dotenv
 
+# Retrieval helpers shared with the indexing script live in 05-rag-1 (the
+# folder name is not a valid package name, so it goes on sys.path).
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "05-rag-1"))
+from quantization import search_params  # noqa: E402
+from matryoshka import embedding_dimensions, make_embeddings  # noqa: E402
+from filters import build_filter, parse_page_range  # noqa: E402
+from query_cache import CachedQueryEmbeddings, query_cache_from_env, shared_stats  # noqa: E402
+from answer_cache import scope_key  # noqa: E402
+from context_packer import build_context, packer_from_env  # noqa: E402
+from task_queue.connection import redis_conn  # noqa: E402
+from task_queue.resources import DEFAULT_HEALTH_CHECK_SECONDS, WorkerResources  # noqa: E402
+from task_queue.token_stream import TokenPublisher  # noqa: E402
+
 # Load environment variables from a .env file when present.
 load_dotenv()
 
@@ -37,58 +68,158 @@ if not os.getenv("GOOGLE_API_KEY"):
 DRY_RUN = "--dry-run" in sys.argv
 
 # Embedding model instance (cheap to construct). We reuse it for vector ops.
-embeddings_model = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+# EMBED_DIMENSIONS must match the dimension the collection was indexed with.
+EMBED_DIMENSIONS = embedding_dimensions()
+embeddings_model = make_embeddings(EMBED_DIMENSIONS)
 
+# Repeat (FAQ-style) queries skip the embedding round trip. The Redis tier
+# is shared by all workers and outlives forked jobs; creating the client
+# does not connect, so importing this module stays side-effect free.
+query_cache = query_cache_from_env(redis=redis_conn if os.getenv("QUERY_CACHE_REDIS", "1") != "0" else None)
+if query_cache is not None:
+    embeddings_model = CachedQueryEmbeddings(embeddings_model, query_cache)
 
-def _get_vector_db() -> QdrantVectorStore:
-    """Create and return a `QdrantVectorStore` connected to the collection.
 
-    This is intentionally created on-demand so importing this module does not
-    attempt to connect to Qdrant when the web server imports `process_query`.
-    """
-    return QdrantVectorStore.from_existing_collection(
-        url="http://localhost:6333",
-        collection_name="learning_vectors",
-        embedding=embeddings_model,
-    )
+def query_cache_stats() -> dict:
+    """Query-embedding cache hit rate and saved latency across all workers."""
+    return shared_stats(redis_conn)
+
+
+# Vector store, chat model and answer cache of this worker process. Nothing
+# connects until the first job (or `resources.warm()` in run_worker.py), so
+# the web server can import this module. The vector store checks the
+# embedding dimension against the collection config when it is built, and
+# searches collections indexed with `--hybrid` with dense + BM25 fusion.
+resources = WorkerResources(
+    "learning_vectors",
+    embeddings_model,
+    EMBED_DIMENSIONS,
+    health_check_seconds=float(os.getenv("HEALTH_CHECK_SECONDS", str(DEFAULT_HEALTH_CHECK_SECONDS))),
+)
+
+
+# Prompt context assembly (merge overlapping chunks, dedupe, token budget).
+packer = packer_from_env()
 
 
-def process_query(query: str) -> str | None:
+def _search(query: str, search_filter) -> list:
+    """Top-k `(chunk, score)` pairs for `query`; a failed search is retried once on a rebuilt client."""
+    for attempt in range(2):
+        vector_db = resources.vector_store()
+        try:
+            # On a quantized collection the search oversamples the quantized
+            # vectors and rescores with the originals.
+            return vector_db.similarity_search_with_score(
+                query, k=3, filter=search_filter, search_params=search_params()
+            )
+        except Exception as exc:
+            if attempt:
+                raise
+            print(f"Vector search failed ({exc}); reconnecting to Qdrant.")
+            resources.discard_vector_store()
+
+
+def _token_publisher() -> TokenPublisher | None:
+    """Token stream of the RQ job being run (None when called outside a job)."""
+    job = get_current_job()
+    return TokenPublisher(redis_conn, job.id) if job is not None else None
+
+
+def process_query(query: str, source: str | None = None, pages: str | None = None) -> str | None:
     """Process a user query and return the assistant's answer.
 
+    `source` (a stored source path) and `pages` ("12" or "10-20", 1-based)
+    optionally scope the search; Qdrant applies them through its payload
+    indexes while traversing the HNSW graph.
+
     Steps:
-    1. Connect to the Qdrant vector store (lazy).
-    2. Perform a similarity search to retrieve top-k context chunks.
-    3. Format the retrieved context into a prompt for the chat model.
+    1. Get the worker's Qdrant vector store (created by the first job).
+    2. Return the cached answer of a near-duplicate question asked against
+       the current index, if any; otherwise perform a similarity search to
+       retrieve top-k context chunks.
+    3. Pack the retrieved chunks into the prompt context: overlapping chunks
+       merged, duplicated text dropped, best first within
+       `CONTEXT_TOKEN_BUDGET` tokens.
     4. If `DRY_RUN` is enabled, print a preview and return without calling the LLM.
-    5. Invoke the chat model and return the generated content.
+    5. Invoke the chat model (streaming, when run as an RQ job) and return
+       the generated content.
+
+    Run as an RQ job, the answer's token deltas are also published to the
+    job's Redis stream as they are generated (`GET /stream/{job_id}` relays
+    them as Server-Sent Events), ending with a `done` or `error` entry.
 
     Returns the assistant answer string on success, or `None` on error.
     """
+    publisher = _token_publisher()
+    answer = None
+    try:
+        answer = _answer_query(query, source, pages, publisher)
+    finally:
+        if publisher is not None:
+            publisher.close(answer, error="Dry run: retrieval only" if DRY_RUN else "No answer was generated")
+    return answer
+
+
+def _answer_query(query: str, source: str | None, pages: str | None, publisher: TokenPublisher | None) -> str | None:
+    """The steps of `process_query`; answer tokens also go to `publisher` when given."""
     # Log the incoming query for debugging when running the worker manually.
     print(f"Searching Chunks: {query}")
 
+    # The API validates `pages`; jobs enqueued another way may still be malformed.
+    try:
+        page_range = parse_page_range(pages)
+    except ValueError as exc:
+        print(f"Invalid pages {pages!r}: {exc}")
+        return None
+
     # 1) Connect to the vector DB. Catch connection errors and return None
     # so the worker can record the failure instead of crashing the importer.
     try:
-        vector_db = _get_vector_db()
+        resources.vector_store()
+        answer_cache = resources.answer_cache()
     except Exception as exc:
         print(f"Failed to connect to vector DB: {exc}")
         return None
 
-    # 2) Retrieve similar documents (top-k).
-    search_results = vector_db.similarity_search(query, k=3)
-
-    # 3) Build a human-readable context string from the search results. Each
-    # result contains `page_content` and `metadata` fields used for attribution.
-    context = "\n\n\n".join(
-        [
-            f"Page Content: {result.page_content}\n"
-            f"Page Number: {result.metadata.get('page_label', 'N/A')}\n"
-            f"File Location: {result.metadata.get('source', 'N/A')}"
-            for result in search_results
-        ]
-    )
+    # 2) A near-duplicate question answered from the same index version and
+    # scope skips the search and the LLM. The query embedding computed here
+    # is served from the query cache again by the search below. The cache is
+    # optional: if the lookup fails, the job answers the normal way.
+    scope = scope_key(source, page_range)
+    query_vector = None
+    if answer_cache is not None:
+        try:
+            query_vector = embeddings_model.embed_query(query)
+            cached = answer_cache.lookup(query_vector, scope)
+        except Exception as exc:
+            print(f"Answer cache lookup failed: {exc}")
+            cached = None
+            query_vector = None
+        if cached is not None:
+            answer, similarity = cached
+            print(f"Answer cache hit (similarity {similarity:.3f}); skipping retrieval and LLM call.")
+            print(f"Assistant: {answer}")
+            if publisher is not None:
+                publisher.token(answer)
+            return answer
+
+    # Retrieve similar documents (top-k).
+    try:
+        search_results = _search(query, build_filter(source, page_range))
+    except Exception as exc:
+        print(f"Vector search failed: {exc}")
+        return None
+    if query_cache is not None:
+        print(query_cache.summary())
+
+    # 3) Build the context from the search results: chunks of one source that
+    # share their overlap become one passage, repeated text is sent once, and
+    # passages are packed by score under the token budget. Each passage keeps
+    # its page number and file location for attribution. If packing fails
+    # (e.g. the tiktoken encoding cannot be loaded), the chunks are used as
+    # retrieved.
+    context, context_report = build_context(packer, search_results)
+    print(context_report)
     print("Context retrieved from vector store:")
 
     # 4) If dry-run is requested, show a preview and skip LLM usage.
@@ -108,22 +239,40 @@ def process_query(query: str) -> str | None:
         f"\n\nContext:\n{context}"
     )
 
-    # Create the chat model instance. We create it here (inside the function)
-    # so importing this module remains side-effect free.
-    chat_model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+    # The chat model (and its HTTP connections) is reused across jobs.
+    chat_model = resources.chat_model()
 
+    messages = [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=query)]
     try:
-        # Invoke the chat model with a system message and the user's query.
-        response = chat_model.invoke(
-            [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=query)]
-        )
-        print(f"Assistant: {response.content}")
-        return response.content
+        if publisher is None:
+            answer = chat_model.invoke(messages).content
+        else:
+            # Publish each delta as it arrives: the client sees the first
+            # token after retrieval + first-token latency.
+            parts = []
+            for chunk in chat_model.stream(messages):
+                parts.append(chunk.text)
+                publisher.token(chunk.text)
+            answer = "".join(parts)
+        print(f"Assistant: {answer}")
     except Exception as exc:
         # If the LLM call fails (quota, auth, network), print details and
-        # return None so the worker can mark the job as failed.
+        # return None so the worker can mark the job as failed. The next job
+        # gets a fresh chat model.
+        resources.discard_chat_model()
         print("LLM call failed. If this is a quota issue, run with '--dry-run' to validate retrieval without API usage.")
         print(f"Details: {exc}")
         return None
 
+    # Cache the answer with the chunks it was generated from. Failing to
+    # cache must not lose an answer that was already paid for.
+    if answer_cache is not None and query_vector is not None:
+        try:
+            chunk_ids = [str(result.metadata.get("_id")) for result, _ in search_results]
+            answer_cache.store(query, query_vector, answer, chunk_ids, scope)
+            print(answer_cache.summary())
+        except Exception as exc:
+            print(f"Could not cache the answer: {exc}")
+    return answer
+
 # Entry point for RQ workers: `process_query` is importable and side-effect free.
\ No newline at end of file
@@ -2,4 +2,6 @@
 # python 06-rag-queue/worker.py
 
 export $(grep -v '^#' .env | xargs -d '\n')
-rq worker --with-scheduler --url redis://localhost:6379
+# SimpleWorker runs jobs in the worker process, so its Qdrant and Gemini
+# clients are reused across jobs instead of being rebuilt in a fork per job.
+rq worker --with-scheduler --worker-class rq.worker.SimpleWorker --url redis://localhost:6379